@@ -0,0 +1,161 @@
+"""Benchmark da importação de planilhas VPCR.
+
+Gera planilhas sintéticas (com hyperlinks no VPCR Title) de tamanhos crescentes,
+importa cada uma em um banco temporário e mostra como o tempo cresce com o
+número de linhas. Ao final, confere se a importação em blocos (streaming) grava o
+mesmo que a importação em memória e os planos das consultas frequentes. Uso:
+
+    python benchmark_import.py              # 500, 1000, 2000, 5000 linhas
+    python benchmark_import.py 1000 10000   # tamanhos personalizados
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import openpyxl
+
+from main import DatabaseManager, FileImportManager, ParsedWorkbook
+
+DEFAULT_SIZES = [500, 1000, 2000, 5000]
+
+
+def create_workbook(path, rows):
+    """Cria uma planilha no formato esperado pelo importador"""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.append(FileImportManager.EXPECTED_HEADER_ORDER)
+    statuses = ["Draft", "Preliminary Review", "Engineering Work in Progress", "Work Complete"]
+    title_col = FileImportManager.EXPECTED_HEADER_ORDER.index("VPCR Title") + 1
+
+    for i in range(rows):
+        values = {
+            "VPCR Project ID": f"VPCR-{i:06d}",
+            "Initiated Date": datetime(2024, 1 + i % 12, 1 + i % 28),
+            "VPCR Title": f"Mudança de fornecedor {i}",
+            "Sourcing Manager": f"Sourcing {i % 15}",
+            "SQIE(s)": f"SQIE {i % 10}",
+            "Affected Items": f"PN{i:06d}; PN{i + 1:06d}",
+            "Plants Affected - Post CPIF Integration": f"Plant {i % 6}",
+            # Coluna numérica com células vazias (pandas infere float para a coluna inteira)
+            "SCR Item ID": i * 10 if i % 5 else None,
+            "VPCR Status": statuses[i % len(statuses)],
+            "Type of VPCR": "Supplier Change",
+            "Current Supplier": f"Supplier {i % 40}",
+            "Proposed Supplier": f"Supplier {(i + 1) % 40}",
+            "VPCR Requestor": f"Requestor {i % 25}",
+            "Last Updated Date": datetime(2025, 1 + i % 12, 1 + i % 28),
+        }
+        ws.append([values.get(col) for col in FileImportManager.EXPECTED_HEADER_ORDER])
+        ws.cell(row=i + 2, column=title_col).hyperlink = f"https://vpcr.example.com/project/{i}"
+
+    wb.save(path)
+
+
+def create_database(path):
+    """Cria um banco vazio com a tabela vpcr mínima usada pelo aplicativo"""
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS vpcr (id INTEGER PRIMARY KEY AUTOINCREMENT, vpcr TEXT)")
+        conn.commit()
+
+
+def dump_database(path):
+    """Itens e log do banco, sem ids e datas de gravação (para comparar dois bancos)"""
+    with sqlite3.connect(path) as conn:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(vpcr)") if row[1] != 'id']
+        items = sorted(conn.execute(f"SELECT {', '.join(columns)} FROM vpcr").fetchall(), key=str)
+        logs = sorted(conn.execute(
+            "SELECT item_id, field_name, old_value, new_value, change_type FROM log_table"
+        ).fetchall(), key=str)
+    return items, logs
+
+
+def import_with_mode(db_manager, xlsx_path, streaming):
+    """Importa forçando o modo em blocos (limite baixo) ou em memória (limite original)"""
+    threshold, chunk_size = ParsedWorkbook.STREAMING_ROW_THRESHOLD, ParsedWorkbook.STREAMING_CHUNK_SIZE
+    if streaming:
+        ParsedWorkbook.STREAMING_ROW_THRESHOLD, ParsedWorkbook.STREAMING_CHUNK_SIZE = 10, 97
+    else:
+        ParsedWorkbook.STREAMING_ROW_THRESHOLD = float('inf')
+    try:
+        return db_manager.import_from_excel(xlsx_path)
+    finally:
+        ParsedWorkbook.STREAMING_ROW_THRESHOLD, ParsedWorkbook.STREAMING_CHUNK_SIZE = threshold, chunk_size
+
+
+def check_streaming_equivalence(tmp_dir, rows=500):
+    """Confere que os dois modos de importação gravam os mesmos valores e logs.
+
+    Importa a mesma planilha em memória e em blocos em bancos separados e compara
+    o conteúdo; depois reimporta no outro modo, o que não deve alterar nenhum item.
+    """
+    xlsx_path = os.path.join(tmp_dir, "vpcr_modos.xlsx")
+    create_workbook(xlsx_path, rows)
+    dumps = {}
+    ok = True
+    for streaming in (False, True):
+        db_path = os.path.join(tmp_dir, f"vpcr_modo_{int(streaming)}.db")
+        create_database(db_path)
+        db_manager = DatabaseManager(db_path)
+        import_with_mode(db_manager, xlsx_path, streaming)
+        dumps[streaming] = dump_database(db_path)
+        # Trocar de modo entre importações do mesmo arquivo não pode gerar alterações
+        result = import_with_mode(db_manager, xlsx_path, not streaming)
+        if result.get('updated') or result.get('logs_created'):
+            ok = False
+            print(f"  FALHA reimportação {'em memória' if streaming else 'em blocos'}: "
+                  f"{result.get('updated')} itens atualizados, {result.get('logs_created')} logs")
+        db_manager.close()
+
+    same = dumps[False] == dumps[True]
+    if not same:
+        print("  FALHA em blocos e em memória gravaram valores ou logs diferentes")
+    print(f"  {'OK ' if ok and same else 'FALHA'} importação em blocos equivalente à importação em memória ({rows} linhas)")
+    return ok and same
+
+
+def run(sizes):
+    print(f"{'Linhas':>8} | {'Importação (s)':>15} | {'Reimportação (s)':>17} | {'ms/linha':>9}")
+    print("-" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for rows in sizes:
+            xlsx_path = os.path.join(tmp_dir, f"vpcr_{rows}.xlsx")
+            db_path = os.path.join(tmp_dir, f"vpcr_{rows}.db")
+            create_workbook(xlsx_path, rows)
+            create_database(db_path)
+            db_manager = DatabaseManager(db_path)
+
+            # Primeira importação: todos os itens são novos
+            start = time.perf_counter()
+            result = db_manager.import_from_excel(xlsx_path)
+            first_import = time.perf_counter() - start
+            if not result.get('success'):
+                print(f"Falha ao importar {rows} linhas: {result.get('error')}")
+                continue
+
+            # Segunda importação do mesmo arquivo: apenas comparação, sem alterações
+            start = time.perf_counter()
+            db_manager.import_from_excel(xlsx_path)
+            second_import = time.perf_counter() - start
+
+            print(f"{rows:>8} | {first_import:>15.2f} | {second_import:>17.2f} | {first_import * 1000 / rows:>9.2f}")
+
+        print()
+        print("Equivalência dos modos de importação:")
+        check_streaming_equivalence(tmp_dir)
+
+        # Consultas frequentes devem usar os índices criados pelas migrações
+        print()
+        print("Planos de consulta (EXPLAIN QUERY PLAN):")
+        for name, report in db_manager.check_query_plans().items():
+            print(f"  {'OK ' if report['ok'] else 'FALHA'} {name}: {'; '.join(report['plan'])}")
+        db_manager.close()
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES
+    run(sizes)
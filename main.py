@@ -1,10 +1,20 @@
 import flet as ft
 import json
+import io
+import hashlib
 import os
+import sys
 import sqlite3
-from datetime import datetime
+from datetime import datetime, timedelta
 import asyncio
 import threading
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
 from typing import List, Dict, Tuple
 
 try:
@@ -42,6 +52,11 @@ class FileImportManager:
     def __init__(self, app_ref: 'VPCRApp'):
         self.app = app_ref
         self.validated_files: List[Dict] = []  # {path, header_ok, errors, header}
+        self.workbook_cache: Dict[str, ParsedWorkbook] = {}  # path -> planilha lida uma única vez
+        self.import_pipeline = None  # Importação em segundo plano (ImportPipeline)
+        self.progress_throttler = None
+        self.cancel_import_button = None
+        self.skipped_files: List[Dict] = []  # Arquivos ignorados por já terem sido importados
         self.file_picker = None  # Será criado quando a página existir
         self.files_list_container: ft.Container | None = None
         self.import_dialog = None
@@ -78,6 +93,7 @@ class FileImportManager:
         def close_window(e=None):
             # Limpar arquivos selecionados ao fechar
             self.validated_files.clear()
+            self._evict_workbooks()
             
             # Limpar e atualizar a listagem de arquivos
             if self.files_list_container:
@@ -261,13 +277,28 @@ class FileImportManager:
                 )
                 continue
             
-            self.validated_files.append(self._validate_file(path))
+            info = self._validate_file(path)
+            
+            # Mesmo conteúdo já selecionado com outro nome/caminho
+            duplicate = next((f for f in self.validated_files if info['digest'] and f.get('digest') == info['digest']), None)
+            if duplicate:
+                self._evict_workbooks([path])
+                self.app.show_custom_notification(
+                    f"Arquivo '{os.path.basename(path)}' tem o mesmo conteúdo de '{os.path.basename(duplicate['path'])}'!", 
+                    color=ft.Colors.ORANGE_400
+                )
+                continue
+            
+            self.validated_files.append(info)
 
     def _validate_file(self, path: str) -> Dict:
         header_ok = False
         errors: List[str] = []
         header_values: List[str] = []
         
+        digest = None
+        already_imported = None
+        
         # Primeiro verificar se o arquivo existe
         if not os.path.exists(path):
             errors.append(f"Arquivo não encontrado: {os.path.basename(path)}")
@@ -275,54 +306,30 @@ class FileImportManager:
                 'path': path,
                 'header_ok': False,
                 'errors': errors,
-                'header': []
+                'header': [],
+                'digest': None,
+                'already_imported': None
             }
         
-        # Ler arquivo
+        # Ler apenas o header (primeira linha), sem carregar pandas
         if openpyxl is None and path.lower().endswith(('.xlsx', '.xlsm')):
             errors.append("Dependência 'openpyxl' não instalada")
-        elif path.lower().endswith('.xls'):
+        elif path.lower().endswith('.xlsb'):
+            errors.append("Formato .xlsb não suportado (use .xlsx, .xlsm ou .xls)")
+        else:
             try:
-                import xlrd
+                workbook = self._get_workbook(path)
+                header_values = workbook.header
+                if not header_values:
+                    errors.append("Cabeçalho não encontrado na primeira linha")
+                
+                # Conteúdo idêntico a um arquivo já importado (mesmo com outro nome ou caminho)
+                digest = workbook.digest
+                already_imported = self.app.db_manager.get_imported_file(digest, workbook.size)
             except ImportError:
                 errors.append("Dependência 'xlrd' não instalada (necessária para arquivos .xls)")
-        else:
-            if path.lower().endswith('.xlsb'):
-                errors.append("Formato .xlsb não suportado (use .xlsx, .xlsm ou .xls)")
-            else:
-                try:
-                    # Detectar formato do arquivo e usar engine apropriado
-                    try:
-                        import pandas as pd
-                        
-                        # Função para detectar formato real
-                        def detect_format(file_path):
-                            try:
-                                with open(file_path, 'rb') as f:
-                                    header = f.read(8)
-                                if header.startswith(b'PK') or header.startswith(b'<?xml'):
-                                    return 'openpyxl'
-                                elif header.startswith(b'\xd0\xcf\x11\xe0') or header.startswith(b'\x09\x08'):
-                                    return 'xlrd'
-                                else:
-                                    return 'openpyxl'  # fallback
-                            except:
-                                return 'openpyxl'
-                        
-                        engine = detect_format(path)
-                        
-                        try:
-                            df = pd.read_excel(path, engine=engine, nrows=1)
-                        except:
-                            # Tentar o outro engine se falhar
-                            fallback_engine = 'xlrd' if engine == 'openpyxl' else 'openpyxl'
-                            df = pd.read_excel(path, engine=fallback_engine, nrows=1)
-                            
-                        header_values = [str(col).strip() for col in df.columns]
-                    except Exception as ex:
-                        errors.append(f"Erro ao ler arquivo: {ex}")
-                except Exception as ex:
-                    errors.append(f"Erro leitura: {ex}")
+            except Exception as ex:
+                errors.append(f"Erro ao ler arquivo: {ex}")
 
         if header_values:
             # Para arquivos .xls, fazer validação mais flexível
@@ -345,9 +352,26 @@ class FileImportManager:
             'path': path,
             'header_ok': header_ok,
             'errors': errors,
-            'header': header_values
+            'header': header_values,
+            'digest': digest,
+            'already_imported': already_imported
         }
 
+    def _get_workbook(self, path: str) -> 'ParsedWorkbook':
+        """Retorna a planilha em cache (header e digest calculados uma vez por sessão do diálogo)"""
+        workbook = self.workbook_cache.get(path)
+        if workbook is None:
+            workbook = ParsedWorkbook(path)
+            self.workbook_cache[path] = workbook
+        return workbook
+
+    def _evict_workbooks(self, paths=None):
+        """Remove planilhas do cache (todas, se paths não for informado)"""
+        for path in list(self.workbook_cache.keys() if paths is None else paths):
+            workbook = self.workbook_cache.pop(path, None)
+            if workbook:
+                workbook.release()
+
     def _update_files_listing(self):
         if not self.files_list_container:
             return
@@ -360,6 +384,16 @@ class FileImportManager:
             for info in self.validated_files:
                 status_color = ft.Colors.GREEN if info['header_ok'] else ft.Colors.RED
                 errors_text = "; ".join(info['errors']) if info['errors'] else "OK"
+                
+                already_imported = info.get('already_imported')
+                if already_imported and info['header_ok']:
+                    status_color = ft.Colors.ORANGE
+                    imported_at = str(already_imported.get('imported_at') or '')
+                    try:
+                        imported_at = datetime.strptime(imported_at, '%Y-%m-%d %H:%M:%S').strftime('%d/%m/%Y %H:%M')
+                    except ValueError:
+                        pass
+                    errors_text = f"Já importado em {imported_at} ({already_imported.get('file_name')}) - será ignorado"
 
                 def make_remove(path):
                     return lambda e: self.remove_file(path)
@@ -392,6 +426,7 @@ class FileImportManager:
 
     def remove_file(self, path: str):
         self.validated_files = [f for f in self.validated_files if f['path'] != path]
+        self._evict_workbooks([path])
         self._update_files_listing()
         # feedback
         try:
@@ -409,6 +444,9 @@ class FileImportManager:
         self.progress_bar = ft.ProgressBar(width=400, color=colors['accent'], height=8)
         self.progress_text = ft.Text("Preparando importação...", size=14, weight=ft.FontWeight.BOLD)
         self.progress_details = ft.Text("", size=1, color=colors['text_container_secondary'])
+        self.cancel_import_button = ft.TextButton(
+            "Cancelar importação", icon=ft.Icons.CANCEL, on_click=self.cancel_import
+        )
         
         # Container removido conforme solicitado
         
@@ -426,7 +464,8 @@ class FileImportManager:
                 self.progress_bar,
                 ft.Container(height=4),  # Pequeno espaço depois da barra
                 self.progress_details,
-                ft.Container(height=8)  # Espaçamento final
+                ft.Container(height=8),  # Espaçamento final
+                ft.Row([self.cancel_import_button], alignment=ft.MainAxisAlignment.END)
             ], spacing=5, alignment=ft.MainAxisAlignment.START)
             
             self.files_list_container.content = progress_content
@@ -553,6 +592,7 @@ class FileImportManager:
         """Fecha o diálogo de importação e limpa os arquivos"""
         # Limpar arquivos importados
         self.validated_files.clear()
+        self._evict_workbooks()
         
         # Fechar janela
         if hasattr(self, 'import_dialog') and self.import_dialog:
@@ -615,7 +655,7 @@ class FileImportManager:
             print(f"Erro em _add_close_button_to_progress: {e}")
 
     def execute_import(self):
-        """Executa a importação dos arquivos selecionados"""
+        """Inicia a importação dos arquivos selecionados em segundo plano"""
         if not self.validated_files:
             self.app.show_custom_notification(
                 "Nenhum arquivo selecionado para importação.", 
@@ -623,79 +663,112 @@ class FileImportManager:
             )
             return
         
+        if self.import_pipeline and self.import_pipeline.is_running:
+            self.app.show_custom_notification(
+                "Já existe uma importação em andamento.", 
+                color=ft.Colors.ORANGE_400
+            )
+            return
+        
+        # Arquivos com conteúdo idêntico a uma importação anterior não são lidos novamente
+        files_to_import = [info for info in self.validated_files if not info.get('already_imported')]
+        self.skipped_files = [info for info in self.validated_files if info.get('already_imported')]
+        if not files_to_import:
+            self.app.show_custom_notification(
+                "Os arquivos selecionados já foram importados anteriormente (mesmo conteúdo).", 
+                color=ft.Colors.ORANGE_400
+            )
+            return
+        
         # Redimensionar janela atual e adicionar barra de progresso
         self._setup_progress_in_dialog()
         
+        try:
+            # Atualizações da interface limitadas a 10 por segundo
+            self.progress_throttler = ProgressThrottler(self._update_progress, max_per_second=10)
+            
+            # Atualizar progresso inicial
+            self._update_progress("Iniciando importação...", 0, len(files_to_import))
+            
+            # Leitura das planilhas em paralelo e gravação por uma única thread, na ordem de seleção.
+            # A interface não espera: o resumo é mostrado por _finish_import ao final.
+            jobs = [(info['path'], self._get_workbook(info['path'])) for info in files_to_import]
+            self.import_pipeline = ImportPipeline(
+                self.app.db_manager, jobs,
+                on_progress=self.progress_throttler,
+                on_finished=self._finish_import
+            )
+            self.import_pipeline.start()
+            
+        except Exception as e:
+            error_msg = f"💥 Erro crítico durante a importação: {str(e)}"
+            print(f"ERRO CRÍTICO: {e}")
+            self.app.show_custom_notification(error_msg, color=ft.Colors.RED_400, duration=6000)
+            self._add_close_button_to_progress()
+
+    def cancel_import(self, e=None):
+        """Cancela a importação em andamento (o arquivo em gravação é desfeito por inteiro)"""
+        if not (self.import_pipeline and self.import_pipeline.is_running):
+            return
+        self.import_pipeline.cancel()
+        
+        if self.cancel_import_button:
+            self.cancel_import_button.disabled = True
+            self.cancel_import_button.text = "Cancelando..."
+        try:
+            self.app.page.update()
+        except Exception:
+            pass
+
+    def _finish_import(self, pipeline):
+        """Mostra o resumo final da importação (chamado pela thread de gravação)"""
+        if self.progress_throttler:
+            self.progress_throttler.flush()
+        
+        if self.cancel_import_button:
+            self.cancel_import_button.visible = False
+        
+        files_count = len(pipeline.jobs)
+        cancelled = pipeline.cancelled
+        
         try:
             total_imported = 0
             total_updated = 0
             total_lines = 0
             errors = []
             
-            # Atualizar progresso inicial
-            self._update_progress("Iniciando importação...", 0, len(self.validated_files))
-            
-            for file_index, file_info in enumerate(self.validated_files, 1):
-                file_path = file_info['path']
-                file_name = os.path.basename(file_path)
+            for entry in pipeline.results:
+                result = entry['result'] or {'success': False, 'error': 'Importação interrompida'}
+                total_lines += entry['lines']
                 
-                try:
-                    # Contar linhas do arquivo antes da importação
-                    import pandas as pd
-                    try:
-                        df = pd.read_excel(file_path)
-                    except Exception as e:
-                        raise Exception(f"Erro ao ler arquivo: {e}")
-                    lines_in_file = len(df)
-                    total_lines += lines_in_file
-                    
-                    # Atualizar progresso
-                    self._update_progress(f"Processando {file_name}", file_index-1, len(self.validated_files), 
-                                        f"{lines_in_file} linhas encontradas")
-                    
-                    # Callback simplificado (não exibe logs detalhados)
-                    def progress_callback(message):
-                        # Apenas atualizar os detalhes do progresso
-                        if hasattr(self, 'progress_details') and self.progress_details:
-                            # Mostrar apenas a última mensagem relevante
-                            if "linhas processadas" in message.lower():
-                                self.progress_details.value = message
-                                try:
-                                    self.app.page.update()
-                                except:
-                                    pass
-                    
-                    # Executar importação via DatabaseManager
-                    result = self.app.db_manager.import_from_excel(file_path, progress_callback)
-                    
-                    if result['success']:
-                        total_imported += result['imported']
-                        total_updated += result['updated']
-                        logs_info = f", {result.get('logs_created', 0)} logs" if result.get('logs_created', 0) > 0 else ""
-                        success_msg = f"✅ {file_name}: {result['imported']} novos, {result['updated']} atualizados{logs_info}"
-                        
-                        # Capturar itens atualizados se houver
-                        if result.get('updated_items'):
-                            self.app.recently_updated_items.update(result['updated_items'])
-                        
-                        # Atualizar progresso com sucesso
-                        self._update_progress(f"✅ Concluído: {file_name}", file_index, len(self.validated_files), success_msg)
-                    else:
-                        errors.append(f"{file_name}: {result.get('error', 'Erro desconhecido')}")
-                        error_msg = f"❌ {file_name}: {result.get('error', 'Erro desconhecido')}"
-                        
-                        # Atualizar progresso com erro
-                        self._update_progress(f"❌ Erro: {file_name}", file_index, len(self.validated_files), error_msg)
-                        
-                except Exception as e:
-                    error_msg = f"{file_name}: {str(e)}"
-                    errors.append(error_msg)
+                if result['success']:
+                    total_imported += result['imported']
+                    total_updated += result['updated']
                     
-                    # Atualizar progresso com exceção
-                    self._update_progress(f"❌ Exceção: {file_name}", file_index, len(self.validated_files), f"Erro: {str(e)}")
+                    # Capturar itens atualizados se houver
+                    if result.get('updated_items'):
+                        self.app.recently_updated_items.update(result['updated_items'])
+                elif not result.get('cancelled'):
+                    errors.append(f"{entry['file_name']}: {result.get('error', 'Erro desconhecido')}")
+            
+            if cancelled:
+                completed = sum(1 for entry in pipeline.results if entry['result'] and entry['result']['success'])
+                self._update_progress("⏹ Importação cancelada", completed, files_count,
+                                      f"{completed} de {files_count} arquivo(s) gravados; o arquivo em andamento foi desfeito")
+                self.app.notify(
+                    f"⏹ Importação cancelada\n"
+                    f"✅ Arquivos gravados: {completed} de {files_count}\n"
+                    f"✅ Novos itens: {total_imported}\n"
+                    f"🔄 Itens atualizados: {total_updated}",
+                    kind="warn", auto_hide=5000
+                )
+                if total_imported > 0 or total_updated > 0:
+                    self.app.refresh_data_from_db()
+                self._add_close_button_to_progress()
+                return
             
             # Atualizar progresso final
-            self._update_progress("✅ Importação concluída!", len(self.validated_files), len(self.validated_files), 
+            self._update_progress("✅ Importação concluída!", files_count, files_count, 
                                 f"Total: {total_imported} novos, {total_updated} atualizados")
             
             # Mostrar resultado final
@@ -705,9 +778,11 @@ class FileImportManager:
                     f"📊 Total de linhas processadas: {total_lines}\n"
                     f"✅ Novos itens: {total_imported}\n"
                     f"🔄 Itens atualizados: {total_updated}\n"
-                    f"📁 Arquivos processados: {len(self.validated_files)}"
+                    f"📁 Arquivos processados: {files_count}"
                 )
                 
+                if self.skipped_files:
+                    success_message += f"\n⏭ Ignorados (já importados): {len(self.skipped_files)}"
                 if errors:
                     success_message += f"\n⚠️ Erros: {len(errors)}"
                 
@@ -731,7 +806,7 @@ class FileImportManager:
                 threading.Thread(target=clear_new_icons, daemon=True).start()
                 
                 # Mostrar resultado final na própria janela
-                self._show_import_results(total_lines, total_imported, total_updated, len(self.validated_files), len(errors))
+                self._show_import_results(total_lines, total_imported, total_updated, files_count, len(errors))
                 
                 # Usar notificação de sucesso ou warning se houver erros
                 kind = "success" if not errors else "warn"
@@ -739,14 +814,17 @@ class FileImportManager:
                     
             else:
                 # Mostrar resultado de falha na própria janela
-                self._show_import_results(total_lines, total_imported, total_updated, len(self.validated_files), len(errors))
+                self._show_import_results(total_lines, total_imported, total_updated, files_count, len(errors))
                 
                 error_message = (
                     f"❌ Nenhum item foi importado!\n"
                     f"📊 Linhas processadas: {total_lines}\n"
-                    f"📁 Arquivos analisados: {len(self.validated_files)}"
+                    f"📁 Arquivos analisados: {files_count}"
                 )
                 
+                if self.skipped_files:
+                    error_message += f"\n⏭ Ignorados (já importados): {len(self.skipped_files)}"
+                
                 if errors:
                     error_message += f"\n🚨 Erros encontrados: {len(errors)}"
                     for i, error in enumerate(errors[:3], 1):  # Mostrar apenas os primeiros 3 erros
@@ -765,7 +843,8 @@ class FileImportManager:
             print(f"Total de linhas: {total_lines}")
             print(f"Novos itens: {total_imported}")
             print(f"Itens atualizados: {total_updated}")
-            print(f"Arquivos processados: {len(self.validated_files)}")
+            print(f"Arquivos processados: {files_count}")
+            print(f"Arquivos ignorados (já importados): {len(self.skipped_files)}")
             print(f"Erros encontrados: {len(errors)}")
             if errors:
                 print("\nDetalhes dos erros:")
@@ -845,135 +924,1814 @@ class NotificationIconAnimator:
         self.animation_tasks.clear()
         self.animated_icons.clear()
 
+class XlsxStreamReader:
+    """Leitura em streaming (zip + XML) de arquivos .xlsx/.xlsm.
+
+    Evita carregar o workbook inteiro com openpyxl: o header e os hyperlinks
+    são lidos diretamente do XML da planilha, em uma única passada.
+    """
+
+    NS_MAIN = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+    NS_DOC_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+    NS_PKG_REL = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+    def __init__(self, source):
+        # source pode ser um caminho ou um objeto file-like (ex.: BytesIO)
+        self.source = source
+
+    @staticmethod
+    def column_index(cell_ref):
+        """Converte a referência de célula (ex.: 'C12') em índice de coluna 1-based"""
+        index = 0
+        for ch in cell_ref:
+            if 'A' <= ch <= 'Z':
+                index = index * 26 + (ord(ch) - 64)
+            elif 'a' <= ch <= 'z':
+                index = index * 26 + (ord(ch) - 96)
+            else:
+                break
+        return index
+
+    @staticmethod
+    def row_number(cell_ref):
+        """Extrai o número da linha de uma referência de célula (ex.: 'C12' -> 12)"""
+        digits = ''.join(ch for ch in cell_ref if ch.isdigit())
+        return int(digits) if digits else 0
+
+    def _read_rels(self, zf, rels_path):
+        """Lê um arquivo .rels e retorna {rId: (target, target_mode)}"""
+        if rels_path not in zf.namelist():
+            return {}
+        rels = {}
+        with zf.open(rels_path) as f:
+            for _, elem in ET.iterparse(f):
+                if elem.tag == self.NS_PKG_REL + 'Relationship':
+                    rels[elem.get('Id')] = (elem.get('Target', ''), elem.get('TargetMode', ''))
+        return rels
+
+    @staticmethod
+    def _resolve_target(base_dir, target):
+        """Resolve o caminho de uma relação interna do pacote"""
+        if target.startswith('/'):
+            return target.lstrip('/')
+        return posixpath.normpath(posixpath.join(base_dir, target))
+
+    def sheet_paths(self, zf):
+        """Retorna [(nome, caminho_xml)] das planilhas, com a planilha ativa primeiro"""
+        rels = self._read_rels(zf, 'xl/_rels/workbook.xml.rels')
+        sheets = []
+        active_tab = 0
+        with zf.open('xl/workbook.xml') as f:
+            for _, elem in ET.iterparse(f):
+                if elem.tag == self.NS_MAIN + 'workbookView':
+                    active_tab = int(elem.get('activeTab', 0) or 0)
+                elif elem.tag == self.NS_MAIN + 'sheet':
+                    rel = rels.get(elem.get(self.NS_DOC_REL + 'id'))
+                    if rel:
+                        sheets.append((elem.get('name'), self._resolve_target('xl', rel[0])))
+        if 0 < active_tab < len(sheets):
+            sheets.insert(0, sheets.pop(active_tab))
+        return sheets
+
+    def _shared_strings(self, zf, max_index):
+        """Lê as shared strings apenas até o maior índice necessário"""
+        strings = []
+        if max_index < 0 or 'xl/sharedStrings.xml' not in zf.namelist():
+            return strings
+        with zf.open('xl/sharedStrings.xml') as f:
+            for _, elem in ET.iterparse(f):
+                if elem.tag == self.NS_MAIN + 'si':
+                    # Texto simples (<t>) ou rich text (<r><t>), ignorando fonética (<rPh>)
+                    parts = []
+                    for child in elem:
+                        if child.tag == self.NS_MAIN + 't':
+                            parts.append(child.text or '')
+                        elif child.tag == self.NS_MAIN + 'r':
+                            parts.append(child.findtext(self.NS_MAIN + 't') or '')
+                    strings.append(''.join(parts))
+                    elem.clear()
+                    if len(strings) > max_index:
+                        break
+        return strings
+
+    def read_header(self, zf, sheet_path):
+        """Lê apenas a primeira linha da planilha e retorna a lista de valores (strings)"""
+        cells = []
+        with zf.open(sheet_path) as f:
+            for _, elem in ET.iterparse(f):
+                if elem.tag == self.NS_MAIN + 'c':
+                    cell_type = elem.get('t', 'n')
+                    if cell_type == 'inlineStr':
+                        value = ''.join(t.text or '' for t in elem.iter(self.NS_MAIN + 't'))
+                    else:
+                        v = elem.find(self.NS_MAIN + 'v')
+                        value = v.text if v is not None else None
+                    cells.append((self.column_index(elem.get('r', '')), cell_type, value))
+                elif elem.tag == self.NS_MAIN + 'row':
+                    break
+
+        shared_indexes = [int(value) for _, cell_type, value in cells if cell_type == 's' and value is not None]
+        shared = self._shared_strings(zf, max(shared_indexes) if shared_indexes else -1)
+
+        header = []
+        for position, (col, cell_type, value) in enumerate(cells, start=1):
+            col = col or position
+            while len(header) < col - 1:
+                header.append('')
+            if cell_type == 's' and value is not None:
+                value = shared[int(value)] if int(value) < len(shared) else ''
+            header.append('' if value is None else str(value))
+        return header
+
+    def read_hyperlinks(self, zf, sheet_path, column):
+        """Retorna {linha_excel: link} dos hyperlinks externos da coluna informada (1-based)"""
+        base_dir, sheet_file = posixpath.split(sheet_path)
+        rels = self._read_rels(zf, posixpath.join(base_dir, '_rels', sheet_file + '.rels'))
+        links = {}
+        with zf.open(sheet_path) as f:
+            for _, elem in ET.iterparse(f):
+                if elem.tag == self.NS_MAIN + 'hyperlink':
+                    rel = rels.get(elem.get(self.NS_DOC_REL + 'id'))
+                    target = str(rel[0]).strip() if rel else ''
+                    if target:
+                        # A referência pode ser uma célula ('C5') ou um intervalo ('C5:C9')
+                        ref = elem.get('ref', '').split(':')
+                        first_col = self.column_index(ref[0])
+                        last_col = self.column_index(ref[-1])
+                        if first_col <= column <= last_col:
+                            for excel_row in range(self.row_number(ref[0]), self.row_number(ref[-1]) + 1):
+                                links[excel_row] = target
+                elif elem.tag == self.NS_MAIN + 'row':
+                    # Linhas já processadas não são necessárias, liberar memória
+                    elem.clear()
+        return links
+
+    def read_dimension_rows(self, zf, sheet_path):
+        """Última linha declarada em <dimension> (0 se ausente), sem percorrer as linhas"""
+        with zf.open(sheet_path) as f:
+            for _, elem in ET.iterparse(f, events=('start',)):
+                if elem.tag == self.NS_MAIN + 'dimension':
+                    return self.row_number(elem.get('ref', '').split(':')[-1])
+                if elem.tag == self.NS_MAIN + 'sheetData':
+                    break
+        return 0
+
+
+class ParsedWorkbook:
+    """Planilha compartilhada por validação, contagem, links e importação.
+
+    O arquivo é lido do disco sob demanda (o header lê apenas a primeira linha);
+    header, DataFrame e hyperlinks ficam em cache até release(). Todos usam a mesma
+    planilha: a planilha ativa do arquivo.
+    """
+
+    # Planilhas acima deste número de linhas são importadas em blocos (memória limitada)
+    STREAMING_ROW_THRESHOLD = 20000
+    STREAMING_CHUNK_SIZE = 2000
+
+    def __init__(self, path, data=None, probe=None):
+        self.path = path
+        # data: conteúdo já em memória (opcional); sem ele, cada leitura abre o arquivo
+        self.data = data
+        self._digest = None
+        self._header = None
+        self._sheet_name = None
+        self._sheet_path = None  # Caminho do XML da planilha dentro do zip (.xlsx/.xlsm)
+        self._dataframe = None
+        self._title_links = {}
+        self._estimated_rows = None
+        if probe is not None:
+            # probe: resultado de probe() obtido em outra instância (ex.: na validação)
+            self.size, self._signature = probe['size'], probe['signature']
+            self._digest = probe['digest']
+            self._header, self._estimated_rows = probe['header'], probe['estimated_rows']
+            self._sheet_name, self._sheet_path = probe['sheet_name'], probe['sheet_path']
+        elif data is None:
+            self.size = os.path.getsize(path)
+            with open(path, 'rb') as f:
+                self._signature = f.read(8)
+        else:
+            self.size = len(data)
+            self._signature = data[:8]
+        self.engine = self._detect_engine(self._signature)
+
+    def probe(self):
+        """Planilha resolvida, header e linhas estimadas, para repassar a outro processo sem reler o arquivo"""
+        self.header
+        return {
+            'size': self.size,
+            'signature': self._signature,
+            'digest': self._digest,
+            'header': self._header,
+            'estimated_rows': self.estimated_rows,
+            'sheet_name': self._sheet_name,
+            'sheet_path': self._sheet_path,
+        }
+
+    @staticmethod
+    def _detect_engine(signature):
+        """Detecta o formato real do arquivo Excel baseado no conteúdo"""
+        # Arquivos .xlsx/.xlsm são ZIP (começam com PK); XML mascarado como .xls também vai para openpyxl
+        if signature.startswith(b'PK') or signature.startswith(b'<?xml'):
+            return 'openpyxl'
+        # Arquivos .xls verdadeiros têm assinatura específica
+        if signature.startswith(b'\xd0\xcf\x11\xe0') or signature.startswith(b'\x09\x08'):
+            return 'xlrd'
+        # Fallback: openpyxl (mais comum)
+        return 'openpyxl'
+
+    @property
+    def is_zip(self):
+        return self._signature[:2] == b'PK'
+
+    @property
+    def digest(self):
+        """SHA-256 do conteúdo (identifica o mesmo arquivo mesmo com outro nome ou caminho)"""
+        if self._digest is None:
+            if self.data is not None:
+                self._digest = hashlib.sha256(self.data).hexdigest()
+            else:
+                self._digest = self.digest_file(self.path)[0]
+        return self._digest
+
+    @staticmethod
+    def digest_file(path, chunk_size=1024 * 1024):
+        """SHA-256 e tamanho de um arquivo lido em blocos, sem carregá-lo inteiro na memória"""
+        sha = hashlib.sha256()
+        size = 0
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                sha.update(chunk)
+                size += len(chunk)
+        return sha.hexdigest(), size
+
+    def _buffer(self):
+        """Origem da leitura: os bytes em memória ou o caminho do arquivo"""
+        return io.BytesIO(self.data) if self.data is not None else self.path
+
+    @staticmethod
+    def _xls_active_sheet(book):
+        """Planilha ativa de um .xls aberto em on_demand (xlrd chama a aba ativa de sheet_visible)"""
+        if book.nsheets > 1:
+            for index in range(book.nsheets):
+                sheet = book.sheet_by_index(index)
+                if sheet.sheet_visible:
+                    return sheet
+                book.unload_sheet(index)
+        return book.sheet_by_index(0)
+
+    @property
+    def header(self) -> List[str]:
+        """Valores da linha 1 da planilha ativa (a mesma que será importada), lidos sem carregar pandas"""
+        if self._header is None:
+            if self.is_zip:
+                # .xlsx/.xlsm (inclusive .xlsx renomeado para .xls): streaming do XML dentro do zip
+                reader = XlsxStreamReader(self._buffer())
+                with zipfile.ZipFile(reader.source) as zf:
+                    sheets = reader.sheet_paths(zf)
+                    header = reader.read_header(zf, sheets[0][1]) if sheets else []
+                    if sheets:
+                        self._sheet_name, self._sheet_path = sheets[0]
+                        # Dimensão declarada no início do mesmo XML (linhas estimadas, sem ler as linhas)
+                        self._estimated_rows = max(reader.read_dimension_rows(zf, self._sheet_path) - 1, 0)
+            else:
+                # .xls verdadeiro: xlrd em modo on_demand carrega apenas as planilhas necessárias
+                import xlrd
+                if self.data is not None:
+                    book = xlrd.open_workbook(file_contents=self.data, on_demand=True)
+                else:
+                    book = xlrd.open_workbook(self.path, on_demand=True)
+                try:
+                    sheet = self._xls_active_sheet(book)
+                    self._sheet_name = sheet.name
+                    header = [str(value) for value in sheet.row_values(0)] if sheet.nrows else []
+                finally:
+                    book.release_resources()
+
+            # Descartar células vazias no fim da linha
+            header = [str(value).strip() for value in header]
+            while header and not header[-1]:
+                header.pop()
+            self._header = header
+        return self._header
+
+    def dataframe(self):
+        """DataFrame completo da planilha (mesma planilha do header), lido uma única vez"""
+        if self._dataframe is None:
+            import pandas as pd
+
+            if self._header is None:
+                self.header  # Resolve a planilha ativa
+            sheet_name = self._sheet_name if self._sheet_name is not None else 0
+
+            # dtype=object: sem inferência por coluna, o mesmo texto de iter_dataframes
+            # (um inteiro é "490" mesmo em colunas com células vazias, nunca "490.0")
+            try:
+                self._dataframe = pd.read_excel(self._buffer(), engine=self.engine, sheet_name=sheet_name,
+                                                dtype=object)
+            except Exception as e:
+                # Se falhar, tentar o outro engine
+                fallback_engine = 'xlrd' if self.engine == 'openpyxl' else 'openpyxl'
+                try:
+                    self._dataframe = pd.read_excel(self._buffer(), engine=fallback_engine, sheet_name=sheet_name,
+                                                    dtype=object)
+                except Exception as e2:
+                    # Se ambos falharem, dar uma mensagem mais informativa
+                    error_msg = f"Não foi possível ler o arquivo Excel '{os.path.basename(self.path)}'.\n"
+                    error_msg += f"Erro com {self.engine}: {str(e)[:100]}...\n"
+                    error_msg += f"Erro com {fallback_engine}: {str(e2)[:100]}..."
+                    raise Exception(error_msg)
+        return self._dataframe
+
+    @property
+    def row_count(self):
+        return len(self.dataframe())
+
+    @property
+    def estimated_rows(self):
+        """Linhas de dados estimadas pela dimensão declarada na planilha (sem ler as linhas)"""
+        if self._estimated_rows is None:
+            rows = 0
+            if self.is_zip:
+                try:
+                    self.header  # A dimensão é lida junto com o header
+                    rows = self._estimated_rows or 0
+                except Exception as e:
+                    print(f"Erro ao estimar linhas de {os.path.basename(self.path)}: {e}")
+            self._estimated_rows = rows
+        return self._estimated_rows
+
+    @property
+    def use_streaming(self):
+        """True para planilhas .xlsx grandes, importadas em blocos pelo openpyxl read-only"""
+        return (openpyxl is not None and self.is_zip and self._dataframe is None
+                and self.estimated_rows > self.STREAMING_ROW_THRESHOLD)
+
+    @staticmethod
+    def _convert_cell(cell):
+        """Converte a célula como o leitor openpyxl do pandas (vazio -> "", erro -> NaN, inteiros como int)"""
+        value = cell.value
+        if value is None:
+            return ""
+        if cell.data_type == 'e':
+            return float('nan')
+        if cell.data_type == 'n':
+            integer = int(value)
+            return integer if integer == value else float(value)
+        return value
+
+    def iter_dataframes(self, chunk_size=None):
+        """Lê a planilha em blocos de chunk_size linhas, sem carregar o arquivo inteiro em um DataFrame.
+
+        Cada bloco passa pelo mesmo TextParser usado por pd.read_excel e mantém o índice
+        global das linhas (compatível com title_links). As colunas ficam como object: sem
+        inferência de tipo por bloco, um número inteiro é sempre "490" (nunca "490.0" em
+        blocos que também tenham células vazias).
+        """
+        import pandas as pd
+        try:
+            from pandas.io.parsers import TextParser
+        except ImportError:
+            TextParser = None
+
+        chunk_size = chunk_size or self.STREAMING_CHUNK_SIZE
+        if self._header is None:
+            self.header  # Resolve a planilha ativa
+
+        def build_frame(header, rows, start):
+            width = max([len(header)] + [len(row) for row in rows])
+            padded = [row + [""] * (width - len(row)) for row in [header] + rows]
+            if TextParser is not None:
+                frame = TextParser(padded, header=0, skip_blank_lines=False, dtype=object).read()
+            else:
+                frame = pd.DataFrame(padded[1:], columns=padded[0]).replace("", float('nan'))
+            frame.index = range(start, start + len(frame))
+            return frame
+
+        wb = openpyxl.load_workbook(self._buffer(), read_only=True, data_only=True)
+        try:
+            ws = wb[self._sheet_name] if self._sheet_name in wb.sheetnames else wb.worksheets[0]
+            ws.reset_dimensions()
+            rows_iter = ws.rows
+            first_row = next(rows_iter, None)
+            if first_row is None:
+                return
+            header = [self._convert_cell(cell) for cell in first_row]
+            while header and header[-1] == "":
+                header.pop()
+
+            chunk, blank_rows, start = [], [], 0
+            for cells in rows_iter:
+                row = [self._convert_cell(cell) for cell in cells]
+                while row and row[-1] == "":
+                    row.pop()
+                if not row:
+                    # Linhas vazias no fim da planilha são descartadas (como no pandas)
+                    blank_rows.append(row)
+                    continue
+                chunk.extend(blank_rows)
+                blank_rows = []
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    yield build_frame(header, chunk, start)
+                    start += len(chunk)
+                    chunk = []
+            if chunk:
+                yield build_frame(header, chunk, start)
+        finally:
+            wb.close()
+
+    def title_links(self, col_name="VPCR Title"):
+        """Retorna {row_index: link} da coluna informada (row_index segue o índice do pandas)"""
+        if col_name not in self._title_links:
+            links = {}
+            # .xls verdadeiro (binário) não suporta extração de links
+            if self.is_zip:
+                try:
+                    # Links da mesma planilha do header e da importação
+                    header = self.header
+                    if col_name in header and self._sheet_path:
+                        reader = XlsxStreamReader(self._buffer())
+                        with zipfile.ZipFile(reader.source) as zf:
+                            links = reader.read_hyperlinks(zf, self._sheet_path, header.index(col_name) + 1)
+                except Exception as e:
+                    # XML fora do padrão: carregar o workbook com openpyxl, mas apenas uma vez
+                    print(f"Leitura em streaming de links falhou, usando openpyxl: {e}")
+                    links = self._title_links_openpyxl(col_name)
+            self._title_links[col_name] = {excel_row - 2: link for excel_row, link in links.items() if excel_row >= 2}
+        return self._title_links[col_name]
+
+    def _title_links_openpyxl(self, col_name):
+        """Fallback de extração de links com openpyxl (workbook carregado uma única vez)"""
+        if not openpyxl:
+            return {}
+
+        wb = openpyxl.load_workbook(self._buffer(), data_only=False)
+        try:
+            ws = wb[self._sheet_name] if self._sheet_name in wb.sheetnames else wb.active
+            title_col = None
+            for col in range(1, ws.max_column + 1):
+                cell_value = ws.cell(row=1, column=col).value
+                if cell_value and str(cell_value).strip() == col_name:
+                    title_col = col
+                    break
+            if title_col is None:
+                return {}
+
+            links = {}
+            for (cell,) in ws.iter_rows(min_row=2, min_col=title_col, max_col=title_col):
+                if cell.hyperlink and cell.hyperlink.target:
+                    links[cell.row] = str(cell.hyperlink.target).strip()
+            return links
+        finally:
+            wb.close()
+
+    def release(self):
+        """Libera os bytes e os dados em cache (leituras posteriores voltam ao disco)"""
+        self.data = None
+        self._dataframe = None
+        self._title_links = {}
+
+
+class ImportCancelled(Exception):
+    """Importação interrompida pelo usuário"""
+
+
+class CancellationToken:
+    """Sinaliza o cancelamento de uma operação em andamento (ex.: importação)"""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise ImportCancelled("Importação cancelada pelo usuário")
+
+
+class ProgressThrottler:
+    """Limita as atualizações de progresso na interface a no máximo max_per_second.
+
+    Eventos intermediários são descartados; o último evento pendente é sempre
+    entregue (por um Timer ou em flush()).
+    """
+
+    def __init__(self, callback, max_per_second=10):
+        self.callback = callback
+        self.interval = 1.0 / max_per_second
+        self._last_emit = 0.0
+        self._pending = None
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def __call__(self, *args):
+        deliver = None
+        with self._lock:
+            wait = self.interval - (time.monotonic() - self._last_emit)
+            if wait <= 0 and self._timer is None:
+                self._last_emit = time.monotonic()
+                deliver = args
+            else:
+                self._pending = args
+                if self._timer is None:
+                    self._timer = threading.Timer(max(wait, 0), self._emit_pending)
+                    self._timer.daemon = True
+                    self._timer.start()
+        if deliver is not None:
+            self._deliver(deliver)
+
+    def _emit_pending(self):
+        with self._lock:
+            args, self._pending, self._timer = self._pending, None, None
+            self._last_emit = time.monotonic()
+        if args is not None:
+            self._deliver(args)
+
+    def flush(self):
+        """Entrega imediatamente o último evento pendente"""
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+            args, self._pending, self._timer = self._pending, None, None
+            self._last_emit = time.monotonic()
+        if args is not None:
+            self._deliver(args)
+
+    def _deliver(self, args):
+        try:
+            self.callback(*args)
+        except Exception as e:
+            print(f"Erro ao atualizar progresso: {e}")
+
+
+class ImportPlan:
+    """Operações de uma importação calculadas em memória para serem aplicadas em lote.
+
+    Cada VPCR Project ID acumula seu INSERT ou seus campos de UPDATE e os logs
+    correspondentes, permitindo reaplicar item a item caso o lote falhe.
+    """
+
+    def __init__(self, change_date, row_ids=None):
+        self.change_date = change_date
+        self.row_ids = row_ids or {}  # vpcr -> valor gravado na coluna vpcr, quando difere (ID com espaços)
+        self.keys = []            # VPCR Project IDs na ordem em que aparecem na planilha
+        self.inserts = {}         # vpcr -> {campo: valor}
+        self.updates = {}         # vpcr -> {campo: valor}
+        self.logs = {}            # vpcr -> [(item_id, field_name, old_value, new_value, change_type, change_date)]
+        self.updated_rows = {}    # vpcr -> quantidade de linhas da planilha que atualizaram o item
+        self.updated_items = []   # vpcr atualizados, na ordem das linhas (como no modo linha a linha)
+        self.fingerprints = {}    # vpcr -> import_fingerprint a gravar (None invalida)
+
+    def _touch(self, key):
+        if key not in self.logs:
+            self.keys.append(key)
+            self.logs[key] = []
+
+    def add_insert(self, key, data):
+        self._touch(key)
+        self.inserts[key] = dict(data)
+
+    def add_update(self, key, changes):
+        """Registra campos alterados; se o item ainda será inserido, mescla no INSERT"""
+        self._touch(key)
+        if key in self.inserts:
+            self.inserts[key].update(changes)
+        else:
+            self.updates.setdefault(key, {}).update(changes)
+        self.updated_rows[key] = self.updated_rows.get(key, 0) + 1
+        self.updated_items.append(key)
+
+    def set_fingerprint(self, key, fingerprint):
+        self._touch(key)
+        self.fingerprints[key] = fingerprint
+
+    def add_log(self, key, field_name, old_value, new_value, change_type):
+        self._touch(key)
+        self.logs[key].append((key, field_name, old_value, new_value, change_type, self.change_date))
+
+    def summary(self, failed_keys=()):
+        """Retorna (imported, updated, logs_created, updated_items) desconsiderando itens que falharam"""
+        failed_keys = set(failed_keys)
+        imported = sum(1 for key in self.inserts if key not in failed_keys)
+        updated = sum(count for key, count in self.updated_rows.items() if key not in failed_keys)
+        logs_created = sum(len(logs) for key, logs in self.logs.items() if key not in failed_keys)
+        updated_items = [key for key in self.updated_items if key not in failed_keys]
+        return imported, updated, logs_created, updated_items
+
+
+class PreparedImport:
+    """Planilha já lida e normalizada, pronta para o diff contra o banco.
+
+    Contém apenas DataFrames/Series, podendo ser gerada em outro processo.
+    """
+
+    def __init__(self, path, total_rows, raw, stripped, keys, valid, fingerprints):
+        self.path = path
+        self.total_rows = total_rows
+        self.raw = raw                    # valores como serão gravados (NaN -> "", demais com str())
+        self.stripped = stripped          # mesmos valores sem espaços, usados na comparação
+        self.keys = keys                  # VPCR Project ID normalizado por linha
+        self.valid = valid                # linhas com VPCR Project ID preenchido
+        self.fingerprints = fingerprints  # hash do conteúdo normalizado de cada linha
+
+    @property
+    def fields(self):
+        return list(self.raw.columns)
+
+
+def prepare_import_worker(path, probe=None):
+    """Lê e normaliza uma planilha (executado nos processos do ImportPipeline).
+
+    probe: ParsedWorkbook.probe() da validação, para não resolver a planilha de novo.
+    """
+    return DatabaseManager.prepare_import_frame(ParsedWorkbook(path, probe=probe))
+
+
+class LatencyStats:
+    """Contadores de latência por chamada (quantidade, total e máximo), seguros entre threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def record(self, name, seconds):
+        with self._lock:
+            counter = self._counters.setdefault(name, [0, 0.0, 0.0])
+            counter[0] += 1
+            counter[1] += seconds
+            counter[2] = max(counter[2], seconds)
+
+    def snapshot(self):
+        """Retorna {nome: {'calls', 'total_ms', 'avg_ms', 'max_ms'}}"""
+        with self._lock:
+            return {
+                name: {
+                    'calls': calls,
+                    'total_ms': round(total * 1000, 3),
+                    'avg_ms': round(total * 1000 / calls, 3),
+                    'max_ms': round(maximum * 1000, 3)
+                }
+                for name, (calls, total, maximum) in self._counters.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+
+class PooledConnection:
+    """Empréstimo de uma conexão do pool, devolvida em close() ou ao sair do bloco with.
+
+    Cada acquire() cria um novo empréstimo: o primeiro close() devolve a conexão e os
+    seguintes não têm efeito, mesmo que ela já esteja emprestada a outra thread.
+    Os demais atributos (cursor, execute, commit...) são os da conexão sqlite3.
+    """
+
+    def __init__(self, pool, conn, caller):
+        self._pool = pool
+        self._conn = conn
+        self.caller = caller
+        self.checked_out_at = time.perf_counter()
+
+    def __getattr__(self, name):
+        conn = self.__dict__.get('_conn')
+        if conn is None:
+            raise sqlite3.ProgrammingError("Conexão já devolvida ao pool")
+        return getattr(conn, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Commit/rollback como sqlite3.Connection e, em seguida, devolver ao pool
+        try:
+            if self._conn is not None:
+                return self._conn.__exit__(exc_type, exc_value, traceback)
+        finally:
+            self.close()
+
+    def close(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            self._pool.release(conn, self.caller, time.perf_counter() - self.checked_out_at)
+
+
+class ConnectionPool:
+    """Pool de conexões SQLite reutilizáveis.
+
+    Cada conexão executa os PRAGMAs uma única vez ao ser criada; acquire() a empresta
+    como PooledConnection, cujo close() apenas devolve a conexão ao pool (LIFO), que
+    mantém até max_idle conexões ociosas. As conexões podem ser usadas por qualquer
+    thread, uma de cada vez.
+    """
+
+    def __init__(self, db_path, max_idle=4, timeout=30.0):
+        self.db_path = db_path
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.stats = LatencyStats()
+        self._idle = []
+        self._lock = threading.Lock()
+        self._closed = False
+        # Uso do banco, consultado pela manutenção em segundo plano para detectar ociosidade
+        self.in_use = 0
+        self.last_activity = time.monotonic()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+        conn.execute('PRAGMA busy_timeout = 30000')  # 30 segundos de timeout
+        conn.execute('PRAGMA journal_mode = WAL')    # Write-Ahead Logging para melhor concorrência
+        return conn
+
+    def acquire(self, caller=None):
+        """Empresta uma conexão ociosa do pool ou cria uma nova (caller identifica a chamada nas estatísticas)"""
+        start = time.perf_counter()
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+            self.in_use += 1
+            self.last_activity = time.monotonic()
+        if conn is None:
+            conn = self._connect()
+            self.stats.record('conexão nova', time.perf_counter() - start)
+        else:
+            self.stats.record('conexão do pool', time.perf_counter() - start)
+        return PooledConnection(self, conn, caller)
+
+    def release(self, conn, caller=None, elapsed=0.0):
+        """Devolve a conexão ao pool (chamado uma única vez por PooledConnection.close)"""
+        self.stats.record(caller or 'desconhecido', elapsed)
+        with self._lock:
+            self.in_use -= 1
+            self.last_activity = time.monotonic()
+
+        try:
+            # Transação esquecida aberta não pode vazar para o próximo usuário da conexão
+            if conn.in_transaction:
+                print(f"Conexão devolvida com transação aberta ({caller}), desfazendo")
+                conn.rollback()
+        except sqlite3.Error as e:
+            print(f"Erro ao devolver conexão ao pool: {e}")
+            conn.close()
+            return
+
+        with self._lock:
+            if not self._closed and len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close_all(self):
+        """Fecha as conexões ociosas; as que estiverem em uso são fechadas ao serem devolvidas"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            try:
+                conn.close()
+            except sqlite3.Error as e:
+                print(f"Erro ao fechar conexão: {e}")
+
+
+class ChangeLogWriter:
+    """Buffer de escrita do log_table, gravado em lote com executemany.
+
+    Os registros ficam ligados à transação da conexão informada em add e são
+    gravados nessa mesma transação por flush(conn), logo antes do commit.
+    """
+
+    INSERT_SQL = '''
+        INSERT INTO log_table (item_id, field_name, old_value, new_value, change_type, change_date)
+        VALUES (?, ?, ?, ?, ?, ?)
+    '''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._transaction_rows = {}  # {conexão: [registros]} aguardando o commit da transação
+        self._last_second = None
+        self._last_timestamp = None
+        self.buffered_count = 0  # Registros recebidos
+        self.flushed_count = 0   # Registros gravados no banco
+        self.flush_count = 0     # Comandos executemany executados
+
+    def timestamp(self):
+        """Data/hora local formatada, reaproveitada enquanto o segundo não muda"""
+        now = time.time()
+        second = int(now)
+        with self._lock:
+            if second != self._last_second:
+                self._last_timestamp = datetime.fromtimestamp(now).strftime('%Y-%m-%d %H:%M:%S')
+                self._last_second = second
+            return self._last_timestamp
+
+    def add(self, conn, item_id, field_name, old_value, new_value, change_type='update', change_date=None):
+        """Enfileira um registro de alteração na transação de conn"""
+        row = (item_id, field_name, str(old_value) if old_value else '', str(new_value) if new_value else '',
+               change_type, change_date or self.timestamp())
+        with self._lock:
+            self.buffered_count += 1
+            self._transaction_rows.setdefault(conn, []).append(row)
+
+    def write(self, cursor, rows):
+        """Grava os registros com executemany no cursor informado (sem commit)"""
+        if not rows:
+            return
+        cursor.executemany(self.INSERT_SQL, rows)
+        with self._lock:
+            self.flushed_count += len(rows)
+            self.flush_count += 1
+
+    def flush(self, conn):
+        """Grava os registros da transação dessa conexão (o chamador faz o commit)"""
+        with self._lock:
+            rows = self._transaction_rows.pop(conn, [])
+        self.write(conn.cursor(), rows)
+
+    def discard(self, conn):
+        """Descarta os registros de uma transação desfeita (rollback)"""
+        with self._lock:
+            self._transaction_rows.pop(conn, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': sum(len(rows) for rows in self._transaction_rows.values()),
+                'buffered': self.buffered_count,
+                'flushed': self.flushed_count,
+                'flushes': self.flush_count
+            }
+
+
+class ItemRecord:
+    """Item VPCR em memória (uma linha da tabela vpcr), compacto e com acesso estilo dict.
+
+    Os valores ficam em __slots__ com os nomes das colunas do banco; os nomes usados
+    pela interface ('ID', 'Status', 'Supplier'...) e seus apelidos ('vpcr', 'Current
+    Supplier', 'Affected Items'...) são apenas chaves que apontam para o mesmo slot.
+    Campos categóricos são internados: itens com o mesmo status/supplier compartilham a string.
+    """
+
+    # Chave de exibição -> coluna do banco (mesma ordem e chaves do antigo dict de get_all_items)
+    FIELD_ALIASES = {
+        'ID': 'vpcr',
+        'vpcr': 'vpcr',
+        'Title': 'vpcr_title',
+        'Initiated Date': 'initiated_date',
+        'Last Update': 'last_update',
+        'Closed Date': 'closed_date',
+        'Category': 'category_3_group',
+        'Supplier': 'current_supplier',
+        'PNs': 'items_affected',
+        'Plants Affected': 'plants_affected',
+        'Requestor': 'vpcr_requestor',
+        'Sourcing Manager': 'sourcing_manager',
+        'SQIE': 'sqie_s',
+        'Continuity': 'continuity',
+        'Status': 'vpcr_status',
+        'RFQ': 'rfq',
+        'DRA': 'dra',
+        'DQR': 'dqr',
+        'LOI': 'loi',
+        'Tooling': 'tooling',
+        'Drawing': 'drawing',
+        'PO Alfa': 'po_alfa',
+        'SR': 'sr_roc',
+        'Deviation': 'deviation',
+        'PO Beta': 'po_beta',
+        'PPAP': 'ppap',
+        'GBPA': 'gbpa',
+        'EDI': 'edi',
+        'SCR': 'scr_item_id',
+        'Comments': 'comments',
+        'Log': 'log',
+        'Link': 'link_vpcr',
+        'Type of VPCR': 'type_of_vpcr',
+        'Current Supplier': 'current_supplier',
+        'Proposed Supplier': 'proposed_supplier',
+        'Category 3 (Group)': 'category_3_group',
+        'Category 2 (Area)': 'category_2_area',
+        'Supporting Documentation': 'supporting_documentation',
+        'Project Editor': 'project_editor',
+        'Change Manager': 'change_manager',
+        'Affected Items': 'items_affected',
+        'Desired Production Date at Affected Plant(s)': 'desired_production_date',
+        'SCR Item ID': 'scr_item_id',
+        'new_data': 'new_data'
+    }
+    COLUMNS = tuple(dict.fromkeys(FIELD_ALIASES.values()))
+    CATEGORICAL_COLUMNS = ('vpcr_status', 'current_supplier', 'proposed_supplier', 'sourcing_manager',
+                           'vpcr_requestor', 'continuity', 'category_3_group', 'category_2_area', 'type_of_vpcr')
+    LIST_COLUMNS = ('items_affected', 'plants_affected')  # valores separados por ';'
+
+    __slots__ = COLUMNS + ('_extra',)
+
+    def __init__(self, values=None):
+        self._extra = None
+        values = values or {}
+        for column in self.COLUMNS:
+            setattr(self, column, values.get(column, False if column == 'new_data' else ''))
+
+    @classmethod
+    def from_row(cls, columns, row):
+        """Cria o item a partir de uma linha de SELECT * FROM vpcr"""
+        record = cls(dict(zip(columns, row)))
+        for column in cls.CATEGORICAL_COLUMNS:
+            value = getattr(record, column)
+            if isinstance(value, str):
+                setattr(record, column, sys.intern(value))
+        for column in cls.LIST_COLUMNS:
+            value = getattr(record, column)
+            if value:
+                # Normalizar a lista: itens sem espaços extras, separados por "; "
+                setattr(record, column, '; '.join(cls.split_list(value)))
+        return record
+
+    @staticmethod
+    def split_list(value):
+        """Partes não vazias de um campo separado por ';' (PNs, plantas)"""
+        if not value:
+            return []
+        return [part.strip() for part in str(value).split(';') if part.strip()]
+
+    def get(self, key, default=None):
+        column = self.FIELD_ALIASES.get(key)
+        if column is not None:
+            return getattr(self, column)
+        if self._extra is not None:
+            return self._extra.get(key, default)
+        return default
+
+    def __getitem__(self, key):
+        column = self.FIELD_ALIASES.get(key)
+        if column is not None:
+            return getattr(self, column)
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        column = self.FIELD_ALIASES.get(key)
+        if column is not None:
+            setattr(self, column, value)
+        else:
+            # Chaves fora do esquema (raras) ficam em um dict criado sob demanda
+            if self._extra is None:
+                self._extra = {}
+            self._extra[key] = value
+
+    def __contains__(self, key):
+        return key in self.FIELD_ALIASES or (self._extra is not None and key in self._extra)
+
+    def keys(self):
+        keys = list(self.FIELD_ALIASES)
+        if self._extra:
+            keys.extend(self._extra)
+        return keys
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.FIELD_ALIASES) + (len(self._extra) if self._extra else 0)
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def to_dict(self):
+        return dict(self.items())
+
+    def update_from(self, other):
+        """Copia os valores de outro ItemRecord mantendo este objeto (referências continuam válidas)"""
+        for column in self.COLUMNS:
+            setattr(self, column, getattr(other, column))
+        self._extra = dict(other._extra) if other._extra else None
+
+    def __repr__(self):
+        return f"ItemRecord({self.vpcr!r})"
+
+
+class FilterIndex:
+    """Índices invertidos (valor -> linhas) dos campos de filtro multiseleção.
+
+    Cada item recebe um número de linha na ordem de inserção (a mesma de sample_data),
+    identificado pelo próprio objeto. Um filtro combinado é a interseção, entre campos,
+    da união das linhas dos valores selecionados em cada campo.
+    """
+
+    # Nome do filtro na interface -> chave do item
+    FIELDS = {
+        "VPCR": "vpcr",
+        "Sourcing Manager": "Sourcing Manager",
+        "Status": "Status",
+        "Supplier": "Supplier",
+        "Requestor": "Requestor",
+        "Continuity": "Continuity",
+    }
+
+    def __init__(self, items=()):
+        self.build(items)
+
+    def build(self, items):
+        """Recria os índices a partir da lista completa de itens"""
+        self.rows = []          # linha -> item (None para itens removidos)
+        self.row_values = []    # linha -> valores indexados do item
+        self.row_of = {}        # id(item) -> linha
+        self.index = {field: {} for field in self.FIELDS}
+        self.version = getattr(self, 'version', 0) + 1
+        for item in items:
+            self.add(item)
+
+    def _values_of(self, item):
+        return tuple(item.get(key, "") for key in self.FIELDS.values())
+
+    def add(self, item):
+        if not item or id(item) in self.row_of:
+            return
+        row = len(self.rows)
+        values = self._values_of(item)
+        self.rows.append(item)
+        self.row_values.append(values)
+        self.row_of[id(item)] = row
+        self.version += 1
+        for field, value in zip(self.FIELDS, values):
+            self.index[field].setdefault(value, set()).add(row)
+
+    def _discard(self, field, value, row):
+        rows = self.index[field].get(value)
+        if rows is not None:
+            rows.discard(row)
+            if not rows:
+                del self.index[field][value]
+
+    def update(self, item):
+        """Reindexa um item alterado no lugar (ou adiciona, se ainda não indexado)"""
+        row = self.row_of.get(id(item))
+        if row is None:
+            self.add(item)
+            return
+        old_values = self.row_values[row]
+        new_values = self._values_of(item)
+        if old_values == new_values:
+            return
+        for field, old_value, new_value in zip(self.FIELDS, old_values, new_values):
+            if old_value != new_value:
+                self._discard(field, old_value, row)
+                self.index[field].setdefault(new_value, set()).add(row)
+        self.row_values[row] = new_values
+        self.version += 1
+
+    def remove(self, item):
+        row = self.row_of.pop(id(item), None)
+        if row is None:
+            return
+        for field, value in zip(self.FIELDS, self.row_values[row]):
+            self._discard(field, value, row)
+        self.rows[row] = None
+        self.row_values[row] = None
+        self.version += 1
+
+    def rows_for(self, field, values):
+        """Linhas com algum dos valores no campo"""
+        field_index = self.index[field]
+        matched = set()
+        for value in values:
+            rows = field_index.get(value)
+            if rows:
+                matched |= rows
+        return matched
+
+    def match_rows(self, selections, exclude_field=None, within=None):
+        """Linhas que atendem a todos os filtros selecionados (None = sem filtro, todas as linhas).
+        
+        within restringe o resultado a um conjunto de linhas (ex.: resultado da busca de texto).
+        """
+        result = None
+        # Campos mais seletivos primeiro: interseções menores
+        candidates = [] if within is None else [within]
+        for field, selected in selections.items():
+            if not selected or field == exclude_field or field not in self.index:
+                continue
+            candidates.append(self.rows_for(field, selected))
+        for matched in sorted(candidates, key=len):
+            result = matched if result is None else result & matched
+            if not result:
+                break
+        return result
+
+    def query(self, selections, ranked_ids=None, within_ids=None):
+        """Itens que atendem aos filtros, na ordem original.
+        
+        Com ranked_ids (IDs vpcr da busca de texto), retorna apenas esses itens, na ordem da lista.
+        within_ids (IDs vpcr) restringe o resultado, ex.: itens com os PNs selecionados.
+        """
+        within = None if within_ids is None else self.rows_for("VPCR", within_ids)
+        rows = self.match_rows(selections, within=within)
+        if ranked_ids is not None:
+            vpcr_index = self.index["VPCR"]
+            return [self.rows[row]
+                    for item_id in ranked_ids
+                    for row in sorted(vpcr_index.get(item_id, ()))
+                    if rows is None or row in rows]
+        if rows is None:
+            return [item for item in self.rows if item is not None]
+        return [self.rows[row] for row in sorted(rows)]
+
+    def values(self, field):
+        """Valores presentes no campo (com ao menos um item)"""
+        return self.index[field].keys()
+
+
+class FacetService:
+    """Valores disponíveis de cada filtro, com contagens, dados os demais filtros ativos.
+
+    Usa os índices do FilterIndex: as linhas que atendem aos outros filtros são contadas
+    em uma única passada. O resultado fica em cache pela seleção dos outros campos e é
+    descartado quando o índice muda.
+    """
+
+    def __init__(self, filter_index):
+        self.filter_index = filter_index
+        self._cache = {}
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _selection_key(field, selections, within_ids):
+        # A seleção do próprio campo não altera suas opções
+        return (field, tuple(sorted(
+            (name, frozenset(values)) for name, values in selections.items()
+            if values and name != field
+        )), None if within_ids is None else frozenset(within_ids))
+
+    def facet(self, field, selections, within_ids=None):
+        """Lista ordenada de (valor, contagem) do campo, ignorando valores vazios.
+        
+        within_ids (IDs vpcr, ex.: resultado da busca de texto) restringe a contagem a esses itens.
+        """
+        index = self.filter_index
+        if self._version != index.version:
+            self._cache.clear()
+            self._version = index.version
+        key = self._selection_key(field, selections, within_ids)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+        self.misses += 1
+
+        within = None if within_ids is None else index.rows_for("VPCR", within_ids)
+        rows = index.match_rows(selections, exclude_field=field, within=within)
+        if rows is None:
+            # Sem outros filtros: a contagem é o tamanho de cada lista do índice
+            counts = {value: len(value_rows) for value, value_rows in index.index[field].items()}
+        else:
+            position = list(FilterIndex.FIELDS).index(field)
+            counts = {}
+            for row in rows:
+                value = index.row_values[row][position]
+                counts[value] = counts.get(value, 0) + 1
+        result = sorted((value, count) for value, count in counts.items() if value)
+        self._cache[key] = result
+        return result
+
+    def facets(self, selections, fields=None, within_ids=None):
+        """Facetas de vários campos (todos por padrão)"""
+        return {field: self.facet(field, selections, within_ids) for field in (fields or FilterIndex.FIELDS)}
+
+
+class VersionedCache:
+    """Cache de um único valor, válido enquanto a versão dos dados não mudar (sem timers)"""
+
+    def __init__(self):
+        self.version = None
+        self.value = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, version, loader):
+        """Retorna o valor em cache para esta versão ou carrega com loader()"""
+        if self.value is not None and self.version == version:
+            self.hits += 1
+            return self.value
+        self.misses += 1
+        self.set(version, loader())
+        return self.value
+
+    def set(self, version, value):
+        self.version = version
+        self.value = value
+
+    def invalidate(self):
+        self.version = None
+        self.value = None
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'version': self.version}
+
+
 class DatabaseManager:
     """Classe para gerenciar operações no banco de dados"""
     
+    # Mapear colunas do Excel para campos do banco
+    IMPORT_COLUMN_MAPPING = {
+        'VPCR Project ID': 'vpcr',  # Campo chave para comparação
+        'VPCR Title': 'vpcr_title',
+        'Initiated Date': 'initiated_date',
+        'Last Updated Date': 'last_update',
+        'Closed Date': 'closed_date',
+        'Category 3 (Group)': 'category_3_group',
+        'Current Supplier': 'current_supplier',
+        'Affected Items': 'items_affected',
+        'Plants Affected - Post CPIF Integration': 'plants_affected',
+        'VPCR Requestor': 'vpcr_requestor',
+        'Sourcing Manager': 'sourcing_manager',
+        'SQIE(s)': 'sqie_s',
+        'VPCR Status': 'vpcr_status',
+        'Type of VPCR': 'type_of_vpcr',
+        'Proposed Supplier': 'proposed_supplier',
+        'Category 2 (Area)': 'category_2_area',
+        'Supporting Documentation': 'supporting_documentation',
+        'Project Editor': 'project_editor',
+        'Change Manager': 'change_manager',
+        'Desired Production Date at Affected Plant(s)': 'desired_production_date',
+        'SCR Item ID': 'scr_item_id'
+    }
+    
+    # Campos gravados pela importação (cobertos pelo import_fingerprint)
+    IMPORTED_FIELDS = set(IMPORT_COLUMN_MAPPING.values()) | {'link_vpcr'}
+    
+    # Colunas da tabela vpcr (campos do Excel, campos editáveis do card e controle interno)
+    VPCR_COLUMNS = {
+        'vpcr_title': 'TEXT', 'initiated_date': 'TEXT', 'last_update': 'TEXT', 'closed_date': 'TEXT',
+        'category_3_group': 'TEXT', 'category_2_area': 'TEXT', 'current_supplier': 'TEXT',
+        'proposed_supplier': 'TEXT', 'items_affected': 'TEXT', 'plants_affected': 'TEXT',
+        'vpcr_requestor': 'TEXT', 'sourcing_manager': 'TEXT', 'sqie_s': 'TEXT', 'vpcr_status': 'TEXT',
+        'type_of_vpcr': 'TEXT', 'supporting_documentation': 'TEXT', 'project_editor': 'TEXT',
+        'change_manager': 'TEXT', 'desired_production_date': 'TEXT', 'scr_item_id': 'TEXT',
+        'continuity': 'TEXT', 'rfq': 'TEXT', 'dra': 'TEXT', 'dqr': 'TEXT', 'loi': 'TEXT', 'tooling': 'TEXT',
+        'drawing': 'TEXT', 'po_alfa': 'TEXT', 'sr_roc': 'TEXT', 'deviation': 'TEXT', 'po_beta': 'TEXT',
+        'ppap': 'TEXT', 'gbpa': 'TEXT', 'edi': 'TEXT', 'comments': 'TEXT', 'log': 'TEXT', 'link_vpcr': 'TEXT',
+        'new_data': 'BOOLEAN DEFAULT 0',
+        'import_fingerprint': 'TEXT'  # Hash da última linha importada de cada item (importação incremental)
+    }
+    
     def __init__(self, db_path='vpcr_database.db'):
         self.db_path = db_path
-        self.create_todos_table()
-        self.create_log_table()
-        # Garantir que a coluna new_data existe na tabela vpcr
-        self.ensure_column_exists('vpcr', 'new_data', 'BOOLEAN DEFAULT 0')
+        # Banco separado para o log antigo (ver archive_logs)
+        self.archive_path = os.path.splitext(db_path)[0] + '_archive.db'
+        self.pool = ConnectionPool(db_path)
+        # Resumo de TODOs por item (carregado sob demanda por get_todo_summary)
+        self._todo_summary = None
+        self._todo_summary_version = 0  # Incrementado a cada alteração de TODO (ver get_todo_summary)
+        self._todo_summary_lock = threading.Lock()
+        # Registros do log_table gravados em lote
+        self.change_log = ChangeLogWriter()
+        # Esquema aplicado uma única vez na inicialização; os demais métodos assumem as colunas existentes
+        self.migrate_schema()
     
-    def get_connection(self):
-        """Cria uma nova conexão com o banco de dados com timeout"""
-        conn = sqlite3.connect(self.db_path, timeout=30.0)
-        conn.execute('PRAGMA busy_timeout = 30000')  # 30 segundos de timeout
-        conn.execute('PRAGMA journal_mode = WAL')    # Write-Ahead Logging para melhor concorrência
-        return conn
+    def get_connection(self, caller=None):
+        """Obtém uma conexão do pool (devolvida em close() ou ao sair do bloco with).
+        
+        caller identifica a chamada nos contadores de latência (get_latency_stats).
+        """
+        return self.pool.acquire(caller)
     
-    def create_todos_table(self):
-        """Cria a tabela de todos no banco de dados se não existir"""
-        with self.get_connection() as conn:
+    def get_latency_stats(self):
+        """Latência por método (tempo com a conexão em uso) e custo de obter conexões"""
+        return self.pool.stats.snapshot()
+    
+    def close(self):
+        """Fecha as conexões do pool (chamado ao encerrar o aplicativo)"""
+        log_stats = self.change_log.stats()
+        print(f"Log de alterações: {log_stats['flushed']} registros gravados em {log_stats['flushes']} lotes")
+        stats = self.get_latency_stats()
+        if stats:
+            print("Latência das chamadas ao banco (ms):")
+            for name, counter in sorted(stats.items(), key=lambda entry: -entry[1]['total_ms']):
+                print(f"  {name}: {counter['calls']} chamadas, média {counter['avg_ms']}, máx {counter['max_ms']}")
+        try:
+            # Atualiza as estatísticas usadas pelo planejador para escolher os índices
+            with self.get_connection('close') as conn:
+                conn.execute('PRAGMA optimize')
+        except sqlite3.Error as e:
+            print(f"Erro ao otimizar o banco: {e}")
+        self.pool.close_all()
+    
+    def migrate_schema(self):
+        """Aplica as migrações pendentes, registrando a versão do esquema em PRAGMA user_version"""
+        migrations = self.get_migrations()
+        with self.get_connection('migrate_schema') as conn:
             cursor = conn.cursor()
+            current_version = cursor.execute('PRAGMA user_version').fetchone()[0]
+            if current_version >= len(migrations):
+                return
+            
+            # BEGIN IMMEDIATE serializa instâncias abertas ao mesmo tempo; a versão é relida dentro da transação
+            cursor.execute('BEGIN IMMEDIATE')
+            current_version = cursor.execute('PRAGMA user_version').fetchone()[0]
+            for version, migration in enumerate(migrations[current_version:], start=current_version + 1):
+                migration(cursor)
+                cursor.execute(f'PRAGMA user_version = {version}')
+                print(f"Esquema do banco atualizado para a versão {version}")
+            conn.commit()
+    
+    def get_migrations(self):
+        """Migrações em ordem; a posição na lista (1-based) é a versão do esquema"""
+        return [
+            self._migration_1_base_schema,
+            self._migration_2_lookup_indexes,
+            self._migration_3_item_changes,
+            self._migration_4_full_text_search,
+            self._migration_5_item_lists,
+            self._migration_6_unique_vpcr,
+        ]
+    
+    @staticmethod
+    def _add_missing_columns(cursor, table_name, columns):
+        """Adiciona as colunas que ainda não existem na tabela (usado apenas pelas migrações)"""
+        cursor.execute(f"PRAGMA table_info({table_name})")
+        existing_columns = {column[1] for column in cursor.fetchall()}
+        for column_name, column_type in columns.items():
+            if column_name not in existing_columns:
+                cursor.execute(f'ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}')
+                print(f"Coluna '{column_name}' adicionada à tabela '{table_name}'")
+    
+    def _migration_1_base_schema(self, cursor):
+        """Tabelas vpcr, todos, log_table e imported_files com todas as colunas usadas pelo aplicativo"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS vpcr (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                vpcr TEXT
+            )
+        ''')
+        self._add_missing_columns(cursor, 'vpcr', self.VPCR_COLUMNS)
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS todos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                item_id INTEGER NOT NULL,
+                description TEXT NOT NULL,
+                completed BOOLEAN DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        self._add_missing_columns(cursor, 'todos', {
+            'completed': 'BOOLEAN DEFAULT 0',
+            'created_at': 'TIMESTAMP'
+        })
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS log_table (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                item_id TEXT NOT NULL,
+                field_name TEXT NOT NULL,
+                old_value TEXT,
+                new_value TEXT,
+                change_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                change_type TEXT DEFAULT 'update'
+            )
+        ''')
+        self._add_missing_columns(cursor, 'log_table', {
+            'old_value': 'TEXT',
+            'new_value': 'TEXT',
+            'change_date': 'TIMESTAMP',
+            'change_type': "TEXT DEFAULT 'update'"
+        })
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS imported_files (
+                digest TEXT PRIMARY KEY,
+                file_size INTEGER NOT NULL,
+                file_name TEXT,
+                imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                total_rows INTEGER DEFAULT 0,
+                imported INTEGER DEFAULT 0,
+                updated INTEGER DEFAULT 0,
+                logs_created INTEGER DEFAULT 0
+            )
+        ''')
+    
+    def _migration_2_lookup_indexes(self, cursor):
+        """Índices das buscas por item (cards, TODOs e log), com chave única em vpcr.vpcr"""
+        self._deduplicate_vpcr(cursor)
+        cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_vpcr_vpcr ON vpcr (vpcr)')
+        
+        # Lista ordenada por criação e contagens (total/concluídos/pendentes) por item
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_todos_item_created ON todos (item_id, created_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_todos_item_completed ON todos (item_id, completed)')
+        
+        # Log do card (item + data) e log geral (data), ambos lidos do mais recente para o mais antigo
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_log_item_date ON log_table (item_id, change_date)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_log_date ON log_table (change_date)')
+    
+    @staticmethod
+    def _deduplicate_vpcr(cursor):
+        """Remove registros repetidos de um mesmo vpcr, mantendo o primeiro (menor id).
+
+        O aplicativo sempre exibe e compara o primeiro registro, e as gravações usam
+        WHERE vpcr = ? (atingem todos); TODOs e log se ligam pelo vpcr, não pelo id.
+        Retorna os vpcr que tinham duplicatas.
+        """
+        cursor.execute('SELECT vpcr FROM vpcr WHERE vpcr IS NOT NULL GROUP BY vpcr HAVING COUNT(*) > 1')
+        duplicated = [row[0] for row in cursor.fetchall()]
+        if duplicated:
             cursor.execute('''
-                CREATE TABLE IF NOT EXISTS todos (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    item_id INTEGER NOT NULL,
-                    description TEXT NOT NULL,
-                    completed BOOLEAN DEFAULT 0,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                DELETE FROM vpcr
+                WHERE vpcr IS NOT NULL AND id NOT IN (SELECT MIN(id) FROM vpcr WHERE vpcr IS NOT NULL GROUP BY vpcr)
+            ''')
+            print(f"Aviso: {cursor.rowcount} registro(s) duplicado(s) de {len(duplicated)} VPCR(s) removido(s)")
+        return duplicated
+    
+    def _migration_3_item_changes(self, cursor):
+        """Tabela vpcr_changes alimentada por triggers: cada INSERT/UPDATE/DELETE em vpcr gera uma versão"""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS vpcr_changes (
+                version INTEGER PRIMARY KEY AUTOINCREMENT,
+                vpcr TEXT,
+                changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_vpcr_changes_insert AFTER INSERT ON vpcr
+            BEGIN
+                INSERT INTO vpcr_changes (vpcr) VALUES (NEW.vpcr);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_vpcr_changes_update AFTER UPDATE ON vpcr
+            BEGIN
+                INSERT INTO vpcr_changes (vpcr) VALUES (NEW.vpcr);
+                INSERT INTO vpcr_changes (vpcr) SELECT OLD.vpcr WHERE OLD.vpcr IS NOT NEW.vpcr;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_vpcr_changes_delete AFTER DELETE ON vpcr
+            BEGIN
+                INSERT INTO vpcr_changes (vpcr) VALUES (OLD.vpcr);
+            END
+        ''')
+    
+    # Colunas de texto indexadas pela busca (título, PNs, comentários e fornecedores)
+    SEARCH_COLUMNS = ('vpcr', 'vpcr_title', 'items_affected', 'comments', 'current_supplier', 'proposed_supplier')
+    
+    def _migration_4_full_text_search(self, cursor):
+        """Índice FTS5 vpcr_fts (conteúdo externo da tabela vpcr) mantido por triggers"""
+        columns = ', '.join(self.SEARCH_COLUMNS)
+        old_values = ', '.join(f'OLD.{column}' for column in self.SEARCH_COLUMNS)
+        new_values = ', '.join(f'NEW.{column}' for column in self.SEARCH_COLUMNS)
+        try:
+            cursor.execute(f'''
+                CREATE VIRTUAL TABLE IF NOT EXISTS vpcr_fts USING fts5(
+                    {columns},
+                    content='vpcr', content_rowid='id',
+                    tokenize='unicode61 remove_diacritics 2'
                 )
             ''')
-            conn.commit()
+        except sqlite3.OperationalError as e:
+            # SQLite sem FTS5: search_items usa LIKE
+            print(f"Aviso: busca de texto sem índice FTS5 ({e})")
+            return
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_vpcr_fts_insert AFTER INSERT ON vpcr
+            BEGIN
+                INSERT INTO vpcr_fts (rowid, {columns}) VALUES (NEW.id, {new_values});
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_vpcr_fts_delete AFTER DELETE ON vpcr
+            BEGIN
+                INSERT INTO vpcr_fts (vpcr_fts, rowid, {columns}) VALUES ('delete', OLD.id, {old_values});
+            END
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_vpcr_fts_update AFTER UPDATE OF {columns} ON vpcr
+            BEGIN
+                INSERT INTO vpcr_fts (vpcr_fts, rowid, {columns}) VALUES ('delete', OLD.id, {old_values});
+                INSERT INTO vpcr_fts (rowid, {columns}) VALUES (NEW.id, {new_values});
+            END
+        ''')
+        # Indexar os itens já existentes
+        cursor.execute("INSERT INTO vpcr_fts (vpcr_fts) VALUES ('rebuild')")
+    
+    @staticmethod
+    def build_search_query(text):
+        """Converte o texto digitado em uma consulta FTS5: todos os termos, cada um como prefixo.
+        
+        Cada termo vai entre aspas, então hífens e barras de PNs (ex.: 12345-678) viram frase.
+        """
+        terms = [term.replace('"', '""') for term in (text or '').split()]
+        return ' '.join(f'"{term}"*' for term in terms)
     
-    def create_log_table(self):
-        """Cria a tabela de log para rastrear alterações"""
-        with self.get_connection() as conn:
+    def search_items(self, text, limit=None):
+        """IDs (vpcr) dos itens que contêm todos os termos, do mais relevante para o menos relevante"""
+        query = self.build_search_query(text)
+        if not query:
+            return []
+        with self.get_connection('search_items') as conn:
             cursor = conn.cursor()
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS log_table (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    item_id TEXT NOT NULL,
-                    field_name TEXT NOT NULL,
-                    old_value TEXT,
-                    new_value TEXT,
-                    change_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    change_type TEXT DEFAULT 'update'
+            try:
+                cursor.execute(
+                    'SELECT vpcr FROM vpcr_fts WHERE vpcr_fts MATCH ? ORDER BY rank LIMIT ?',
+                    (query, -1 if limit is None else limit)
+                )
+            except sqlite3.OperationalError as e:
+                if 'vpcr_fts' not in str(e):
+                    print(f"Erro na busca de texto: {e}")
+                    return []
+                # Sem FTS5: cada termo precisa aparecer em alguma das colunas (sem ordenação por relevância)
+                terms = (text or '').split()
+                any_column = '(' + ' OR '.join(f"{column} LIKE ?" for column in self.SEARCH_COLUMNS) + ')'
+                params = [f'%{term}%' for term in terms for _ in self.SEARCH_COLUMNS]
+                cursor.execute(
+                    f"SELECT vpcr FROM vpcr WHERE {' AND '.join(any_column for _ in terms)} LIMIT ?",
+                    params + [-1 if limit is None else limit]
                 )
+            return [row[0] for row in cursor.fetchall() if row[0] is not None]
+    
+    # Campos de lista da tabela vpcr -> tabela normalizada (vpcr, valor) usada nos filtros de PN e planta
+    LIST_TABLES = {
+        'items_affected': ('vpcr_items', 'part_number'),
+        'plants_affected': ('vpcr_plants', 'plant'),
+    }
+    
+    def _migration_5_item_lists(self, cursor):
+        """Tabelas vpcr_items (PNs) e vpcr_plants (plantas) com uma linha por valor de cada item"""
+        for table, value_column in self.LIST_TABLES.values():
+            # Chave (valor, vpcr): "quais VPCRs têm o PN X" é uma busca no índice da chave
+            cursor.execute(f'''
+                CREATE TABLE IF NOT EXISTS {table} (
+                    {value_column} TEXT NOT NULL,
+                    vpcr TEXT NOT NULL,
+                    PRIMARY KEY ({value_column}, vpcr)
+                ) WITHOUT ROWID
             ''')
-            conn.commit()
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_vpcr ON {table} (vpcr)')
+            cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_delete AFTER DELETE ON vpcr
+                BEGIN
+                    DELETE FROM {table} WHERE vpcr = OLD.vpcr;
+                END
+            ''')
+        
+        # Preencher a partir dos itens existentes
+        cursor.execute(f'SELECT vpcr, {", ".join(self.LIST_TABLES)} FROM vpcr WHERE vpcr IS NOT NULL')
+        rows = cursor.fetchall()
+        self._sync_item_lists(cursor, {row[0]: dict(zip(self.LIST_TABLES, row[1:])) for row in rows})
+    
+    def _migration_6_unique_vpcr(self, cursor):
+        """Chave única em vpcr.vpcr para bancos em que a versão 2 criou o índice sem UNIQUE (IDs duplicados)"""
+        indexes = {row[1]: row[2] for row in cursor.execute('PRAGMA index_list(vpcr)').fetchall()}
+        if indexes.get('idx_vpcr_vpcr'):
+            return
+        duplicated = self._deduplicate_vpcr(cursor)
+        cursor.execute('DROP INDEX IF EXISTS idx_vpcr_vpcr')
+        cursor.execute('CREATE UNIQUE INDEX idx_vpcr_vpcr ON vpcr (vpcr)')
+        
+        # A exclusão das duplicatas também removeu (por trigger) os PNs e plantas do registro mantido
+        for start in range(0, len(duplicated), 500):
+            batch = duplicated[start:start + 500]
+            placeholders = ', '.join('?' for _ in batch)
+            cursor.execute(f'SELECT vpcr, {", ".join(self.LIST_TABLES)} FROM vpcr WHERE vpcr IN ({placeholders})', batch)
+            rows = cursor.fetchall()
+            self._sync_item_lists(cursor, {row[0]: dict(zip(self.LIST_TABLES, row[1:])) for row in rows})
+    
+    def _sync_item_lists(self, cursor, items):
+        """Regrava vpcr_items/vpcr_plants dos itens {vpcr: {coluna: valor}} (apenas as colunas presentes)"""
+        for column, (table, value_column) in self.LIST_TABLES.items():
+            changed = [(item_id, values[column]) for item_id, values in items.items() if column in values]
+            if not changed:
+                continue
+            cursor.executemany(f'DELETE FROM {table} WHERE vpcr = ?', [(item_id,) for item_id, _ in changed])
+            cursor.executemany(
+                f'INSERT OR IGNORE INTO {table} ({value_column}, vpcr) VALUES (?, ?)',
+                [(part, item_id) for item_id, value in changed for part in ItemRecord.split_list(value)]
+            )
     
-    def ensure_column_exists(self, table_name, column_name, column_type='TEXT'):
-        """Garante que uma coluna existe na tabela especificada"""
-        with self.get_connection() as conn:
+    def get_items_with_list_values(self, column, values):
+        """IDs (vpcr) dos itens que têm algum dos valores no campo de lista (ex.: PNs em items_affected)"""
+        table, value_column = self.LIST_TABLES[column]
+        values = list(values)
+        found = set()
+        with self.get_connection('get_items_with_list_values') as conn:
             cursor = conn.cursor()
-            
-            # Verificar se a coluna já existe
-            cursor.execute(f"PRAGMA table_info({table_name})")
-            columns = cursor.fetchall()
-            existing_columns = [column[1] for column in columns]
-            
-            if column_name not in existing_columns:
-                try:
-                    # Adicionar a coluna se não existir
-                    cursor.execute(f'ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}')
-                    conn.commit()
-                    print(f"Coluna '{column_name}' adicionada à tabela '{table_name}'")
-                except sqlite3.Error as e:
-                    print(f"Erro ao adicionar coluna '{column_name}' à tabela '{table_name}': {e}")
+            for start in range(0, len(values), 500):
+                batch = values[start:start + 500]
+                placeholders = ', '.join('?' for _ in batch)
+                cursor.execute(f'SELECT vpcr FROM {table} WHERE {value_column} IN ({placeholders})', batch)
+                found.update(row[0] for row in cursor.fetchall())
+        return found
+    
+    def get_list_value_counts(self, column, item_ids=None):
+        """Valores do campo de lista com o número de itens, opcionalmente restritos aos IDs informados"""
+        table, value_column = self.LIST_TABLES[column]
+        counts = {}
+        with self.get_connection('get_list_value_counts') as conn:
+            cursor = conn.cursor()
+            if item_ids is None:
+                cursor.execute(f'SELECT {value_column}, COUNT(*) FROM {table} GROUP BY {value_column}')
+                counts = dict(cursor.fetchall())
+            else:
+                item_ids = list(item_ids)
+                for start in range(0, len(item_ids), 500):
+                    batch = item_ids[start:start + 500]
+                    placeholders = ', '.join('?' for _ in batch)
+                    cursor.execute(
+                        f'SELECT {value_column}, COUNT(*) FROM {table} WHERE vpcr IN ({placeholders}) '
+                        f'GROUP BY {value_column}', batch
+                    )
+                    for value, count in cursor.fetchall():
+                        counts[value] = counts.get(value, 0) + count
+        return sorted(counts.items())
+    
+    # Consultas frequentes e o índice que cada uma deve usar (verificadas com EXPLAIN QUERY PLAN)
+    HOT_QUERIES = {
+        'card por ID': ("SELECT * FROM vpcr WHERE vpcr = ?", ('',), 'idx_vpcr_vpcr'),
+        'TODOs do item': ("SELECT id, description, completed FROM todos WHERE item_id = ? ORDER BY created_at",
+                          ('',), 'idx_todos_item_created'),
+        'TODOs pendentes': ("SELECT COUNT(*) FROM todos WHERE item_id = ? AND completed = 0",
+                            ('',), 'idx_todos_item_completed'),
+        'log do card': ("SELECT * FROM log_table WHERE item_id = ? ORDER BY change_date DESC LIMIT ?",
+                        ('', 100), 'idx_log_item_date'),
+        'página do log': ("SELECT * FROM log_table WHERE item_id = ? AND (change_date, id) < (?, ?) "
+                          "ORDER BY change_date DESC, id DESC LIMIT ?", ('', '', 0, 50), 'idx_log_item_date'),
+        'log geral': ("SELECT * FROM log_table ORDER BY change_date DESC LIMIT ?", (100,), 'idx_log_date'),
+        'VPCRs por PN': ("SELECT vpcr FROM vpcr_items WHERE part_number IN (?)", ('',), 'PRIMARY KEY'),
+        'VPCRs por planta': ("SELECT vpcr FROM vpcr_plants WHERE plant IN (?)", ('',), 'PRIMARY KEY'),
+    }
+    
+    def check_query_plans(self):
+        """Executa EXPLAIN QUERY PLAN nas consultas frequentes.
+        
+        Retorna {nome: {'plan': [...], 'ok': bool}}; 'ok' indica que o índice esperado
+        é usado e que não há SCAN da tabela nem ordenação temporária.
+        """
+        report = {}
+        with self.get_connection('check_query_plans') as conn:
+            cursor = conn.cursor()
+            for name, (query, params, index_name) in self.HOT_QUERIES.items():
+                cursor.execute(f'EXPLAIN QUERY PLAN {query}', params)
+                plan = [row[-1] for row in cursor.fetchall()]
+                ok = (any(index_name in detail for detail in plan)
+                      and not any(detail.startswith('SCAN') and 'INDEX' not in detail for detail in plan)
+                      and not any('TEMP B-TREE' in detail for detail in plan))
+                if not ok:
+                    print(f"Aviso: consulta '{name}' sem o índice {index_name}: {plan}")
+                report[name] = {'plan': plan, 'ok': ok}
+        return report
+    
+    def get_imported_file(self, digest, file_size):
+        """Retorna o registro de importação de um arquivo com o mesmo conteúdo, ou None"""
+        with self.get_connection('get_imported_file') as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                'SELECT * FROM imported_files WHERE digest = ? AND file_size = ?', (digest, file_size)
+            )
+            columns = [description[0] for description in cursor.description]
+            row = cursor.fetchone()
+            return dict(zip(columns, row)) if row else None
+    
+    @staticmethod
+    def invalidate_imported_files(cursor):
+        """Esquece os arquivos já importados (campos da planilha editados fora da importação).
 
+        Um arquivo idêntico ao já importado deixa de ser ignorado e volta a ser comparado
+        com o banco, restaurando os valores editados manualmente.
+        """
+        cursor.execute('DELETE FROM imported_files')
+    
+    def record_imported_file(self, digest, file_size, file_name, total_rows, result):
+        """Registra um arquivo importado com sucesso e os totais da importação"""
+        with self.get_connection('record_imported_file') as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO imported_files
+                    (digest, file_size, file_name, imported_at, total_rows, imported, updated, logs_created)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (digest, file_size, file_name, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), total_rows,
+                  result.get('imported', 0), result.get('updated', 0), result.get('logs_created', 0)))
+            conn.commit()
     
     def get_todos_for_item(self, item_id):
         """Busca todos os TODOs para um item específico"""
-        with self.get_connection() as conn:
+        with self.get_connection('get_todos_for_item') as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT id, description, completed FROM todos WHERE item_id = ? ORDER BY created_at', (item_id,))
             return [{'id': row[0], 'description': row[1], 'completed': bool(row[2])} for row in cursor.fetchall()]
     
+    def get_todo_summary(self, refresh=False):
+        """Resumo {item_id: {'total', 'completed'}} de todos os itens com TODOs.
+        
+        Carregado com uma única consulta agregada e mantido em memória; add_todo,
+        update_todo, toggle_todo e delete_todo atualizam o resumo incrementalmente.
+        """
+        while True:
+            with self._todo_summary_lock:
+                if self._todo_summary is not None and not refresh:
+                    return self._todo_summary
+                version = self._todo_summary_version
+            
+            with self.get_connection('get_todo_summary') as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT item_id, COUNT(*), SUM(CASE WHEN completed = 1 THEN 1 ELSE 0 END)
+                    FROM todos
+                    GROUP BY item_id
+                ''')
+                # item_id tem afinidade INTEGER: IDs numéricos voltam como int, a chave é sempre str
+                summary = {str(item_id): {'total': total, 'completed': completed or 0}
+                           for item_id, total, completed in cursor.fetchall()}
+            
+            # Só guarda se nenhum TODO mudou durante a consulta; senão a alteração poderia
+            # ser perdida (ou contada duas vezes) e o resumo é recarregado
+            with self._todo_summary_lock:
+                if self._todo_summary_version == version:
+                    self._todo_summary = summary
+                    return summary
+            refresh = True
+    
+    def _adjust_todo_summary(self, item_id, total_delta=0, completed_delta=0):
+        """Aplica uma alteração de TODO ao resumo em memória (se já carregado)"""
+        with self._todo_summary_lock:
+            self._todo_summary_version += 1
+            if self._todo_summary is None or item_id is None:
+                return
+            key = str(item_id)
+            counts = self._todo_summary.setdefault(key, {'total': 0, 'completed': 0})
+            counts['total'] += total_delta
+            counts['completed'] += completed_delta
+            if counts['total'] <= 0:
+                del self._todo_summary[key]
+    
+    def get_incomplete_todo_ids(self):
+        """IDs dos itens com algum TODO pendente"""
+        return {item_id for item_id, counts in self.get_todo_summary().items()
+                if counts['total'] > counts['completed']}
+    
     def add_todo(self, item_id, description):
         """Adiciona um novo TODO"""
-        with self.get_connection() as conn:
+        with self.get_connection('add_todo') as conn:
             cursor = conn.cursor()
             cursor.execute('INSERT INTO todos (item_id, description) VALUES (?, ?)', (item_id, description))
             conn.commit()
+            self._adjust_todo_summary(item_id, total_delta=1)
             return cursor.lastrowid
     
     def update_todo(self, todo_id, description=None, completed=None):
         """Atualiza um TODO existente"""
-        with self.get_connection() as conn:
+        with self.get_connection('update_todo') as conn:
             cursor = conn.cursor()
             if description is not None:
                 cursor.execute('UPDATE todos SET description = ? WHERE id = ?', (description, todo_id))
+            previous = None
             if completed is not None:
+                previous = cursor.execute('SELECT item_id, completed FROM todos WHERE id = ?', (todo_id,)).fetchone()
                 cursor.execute('UPDATE todos SET completed = ? WHERE id = ?', (completed, todo_id))
             conn.commit()
+            if previous:
+                self._adjust_todo_summary(previous[0], completed_delta=int(bool(completed)) - int(bool(previous[1])))
     
     def toggle_todo(self, todo_id):
         """Alterna o status de conclusão de um TODO"""
-        with self.get_connection() as conn:
+        with self.get_connection('toggle_todo') as conn:
             cursor = conn.cursor()
             cursor.execute('UPDATE todos SET completed = NOT completed WHERE id = ?', (todo_id,))
+            row = cursor.execute('SELECT item_id, completed FROM todos WHERE id = ?', (todo_id,)).fetchone()
             conn.commit()
+            if row:
+                self._adjust_todo_summary(row[0], completed_delta=1 if row[1] else -1)
     
     def delete_todo(self, todo_id):
         """Remove um TODO"""
-        with self.get_connection() as conn:
+        with self.get_connection('delete_todo') as conn:
             cursor = conn.cursor()
+            row = cursor.execute('SELECT item_id, completed FROM todos WHERE id = ?', (todo_id,)).fetchone()
             cursor.execute('DELETE FROM todos WHERE id = ?', (todo_id,))
             conn.commit()
+            if row:
+                self._adjust_todo_summary(row[0], total_delta=-1, completed_delta=-1 if row[1] else 0)
     
     def get_todos_count(self, item_id):
         """Retorna a contagem de TODOs para um item"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT COUNT(*) as total, SUM(CASE WHEN completed = 1 THEN 1 ELSE 0 END) as completed FROM todos WHERE item_id = ?', (item_id,))
-            row = cursor.fetchone()
-            return {'total': row[0], 'completed': row[1] or 0}
+        counts = self.get_todo_summary().get(str(item_id))
+        return dict(counts) if counts else {'total': 0, 'completed': 0}
     
     def has_todos(self, item_id):
         """Verifica se um item tem TODOs"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT COUNT(*) FROM todos WHERE item_id = ?', (item_id,))
-            return cursor.fetchone()[0] > 0
+        return str(item_id) in self.get_todo_summary()
     
     def has_incomplete_todos(self, item_id):
         """Verifica se um item tem TODOs incompletos"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT COUNT(*) FROM todos WHERE item_id = ? AND completed = 0', (item_id,))
-            return cursor.fetchone()[0] > 0
+        counts = self.get_todo_summary().get(str(item_id))
+        return bool(counts) and counts['total'] > counts['completed']
     
     def convert_date_format(self, date_str):
         """Converte data de m/d/yyyy para dd/mm/yyyy - Versão melhorada"""
@@ -1063,45 +2821,24 @@ class DatabaseManager:
             return str(date_str)
     
     def log_change(self, item_id, field_name, old_value, new_value, change_type='update', conn=None):
-        """Registra uma alteração no log"""
+        """Registra uma alteração no log.
+        
+        Com conn, o registro é gravado na transação dessa conexão por change_log.flush(conn),
+        que deve ser chamado antes do commit. Sem conn, é gravado imediatamente.
+        """
         # Só registra se houver mudança real
         if str(old_value) == str(new_value):
             return
-        
-        # Obter data/hora local atual
-        from datetime import datetime
-        local_datetime = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        
-        # Usar conexão fornecida ou criar nova
-        if conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                INSERT INTO log_table (item_id, field_name, old_value, new_value, change_type, change_date)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (item_id, field_name, str(old_value) if old_value else '', 
-                  str(new_value) if new_value else '', change_type, local_datetime))
-        else:
-            connection = None
-            try:
-                connection = self.get_connection()
-                cursor = connection.cursor()
-                cursor.execute('''
-                    INSERT INTO log_table (item_id, field_name, old_value, new_value, change_type, change_date)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (item_id, field_name, str(old_value) if old_value else '', 
-                      str(new_value) if new_value else '', change_type, local_datetime))
-                connection.commit()
-            except Exception as e:
-                if connection:
-                    connection.rollback()
-                raise e
-            finally:
-                if connection:
-                    connection.close()
+        if conn is not None:
+            self.change_log.add(conn, item_id, field_name, old_value, new_value, change_type)
+            return
+        with self.get_connection('log_change') as conn:
+            self.change_log.add(conn, item_id, field_name, old_value, new_value, change_type)
+            self.change_log.flush(conn)
     
     def get_item_from_db(self, item_id):
         """Busca um item específico do banco de dados"""
-        with self.get_connection() as conn:
+        with self.get_connection('get_item_from_db') as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT * FROM vpcr WHERE vpcr = ?', (item_id,))
             columns = [description[0] for description in cursor.description]
@@ -1112,7 +2849,7 @@ class DatabaseManager:
     
     def get_item_by_vpcr(self, vpcr_id):
         """Busca um item específico pela coluna vpcr (VPCR Project ID)"""
-        with self.get_connection() as conn:
+        with self.get_connection('get_item_by_vpcr') as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT * FROM vpcr WHERE vpcr = ?', (vpcr_id,))
             columns = [description[0] for description in cursor.description]
@@ -1174,13 +2911,9 @@ class DatabaseManager:
         # Usar uma única conexão para toda a operação
         conn = None
         try:
-            conn = self.get_connection()
+            conn = self.get_connection('upsert_item')
             cursor = conn.cursor()
             
-            # Garantir que todas as colunas necessárias existam na tabela vpcr
-            for app_field, db_field in db_field_mapping.items():
-                self.ensure_column_exists('vpcr', db_field, 'TEXT')
-            
             # Iniciar transação explícita
             cursor.execute('BEGIN IMMEDIATE')
             
@@ -1207,17 +2940,19 @@ class DatabaseManager:
                         update_pairs.append(f'{db_field} = ?')
                         update_values.append(new_value)
                         # Registrar mudança no log na mesma transação
-                        local_datetime = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        cursor.execute('''
-                            INSERT INTO log_table (item_id, field_name, old_value, new_value, change_type, change_date)
-                            VALUES (?, ?, ?, ?, ?, ?)
-                        ''', (item_id, db_field, str(old_value) if old_value else '', 
-                              str(new_value) if new_value else '', 'import_update', local_datetime))
+                        self.change_log.add(conn, item_id, db_field, old_value, new_value, 'import_update')
                 
                 if update_pairs:
+                    # Campos da planilha alterados fora da importação: invalidar o hash incremental
+                    if any(pair.split(' = ')[0] in self.IMPORTED_FIELDS for pair in update_pairs):
+                        update_pairs.append('import_fingerprint = NULL')
+                        self.invalidate_imported_files(cursor)
                     update_sql = f'UPDATE vpcr SET {", ".join(update_pairs)} WHERE vpcr = ?'
                     update_values.append(item_id)
                     cursor.execute(update_sql, update_values)
+                    self._sync_item_lists(cursor, {item_id: {
+                        column: db_data[column] for column in self.LIST_TABLES if column in db_data
+                    }})
             else:
                 # Inserir novo item
                 fields = list(db_data.keys())
@@ -1227,356 +2962,442 @@ class DatabaseManager:
                 
                 insert_sql = f'INSERT OR REPLACE INTO vpcr ({field_names}) VALUES ({placeholders})'
                 cursor.execute(insert_sql, values)
+                self._sync_item_lists(cursor, {item_id: {
+                    column: db_data[column] for column in self.LIST_TABLES if column in db_data
+                }})
                 # Registrar criação no log na mesma transação
-                local_datetime = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                cursor.execute('''
-                    INSERT INTO log_table (item_id, field_name, old_value, new_value, change_type, change_date)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (item_id, 'ITEM_CREATED', '', 'Item criado via importação', 'import_create', local_datetime))
+                self.change_log.add(conn, item_id, 'ITEM_CREATED', '', 'Item criado via importação', 'import_create')
             
-            # Commit da transação
+            # Gravar o log em lote e fazer o commit da transação
+            self.change_log.flush(conn)
             conn.commit()
             
         except Exception as e:
             if conn:
+                self.change_log.discard(conn)
                 conn.rollback()
             raise e
         finally:
             if conn:
                 conn.close()
     
-    def extract_vpcr_title_link(self, file_path, row_index, col_name="VPCR Title"):
-        """Extrai o link incorporado no campo VPCR Title usando openpyxl"""
+    def extract_vpcr_title_links(self, file_path, col_name="VPCR Title", workbook=None):
+        """Extrai todos os links incorporados na coluna VPCR Title em uma única leitura do arquivo.
+
+        Retorna {row_index: link}, onde row_index segue o índice do pandas (linha do Excel - 2).
+        """
         try:
-            if not openpyxl:
-                return ""
-            
-            # Para arquivos .xls, verificar se na verdade é .xlsx renomeado
-            if file_path.lower().endswith('.xls'):
-                # Tentar detectar se é realmente .xls ou .xlsx renomeado
-                try:
-                    with open(file_path, 'rb') as f:
-                        header = f.read(8)
-                    # Se começar com XML, é .xlsx renomeado
-                    if header.startswith(b'<?xml') or header.startswith(b'PK'):
-                        # É um .xlsx renomeado, pode tentar extrair links
-                        pass
-                    else:
-                        # É .xls verdadeiro, não suporta links
-                        return ""
-                except:
-                    return ""
-            
-            # Abrir workbook com openpyxl para acessar hyperlinks
-            wb = openpyxl.load_workbook(file_path, data_only=False)
-            ws = wb.active
-            
-            # Encontrar a coluna do VPCR Title
-            header_row = 1
-            title_col = None
-            for col in range(1, ws.max_column + 1):
-                cell_value = ws.cell(row=header_row, column=col).value
-                if cell_value and str(cell_value).strip() == col_name:
-                    title_col = col
-                    break
-            
-            if title_col is None:
-                # Tentar buscar na primeira planilha se não encontrou na ativa
-                for sheet_name in wb.sheetnames:
-                    ws = wb[sheet_name]
-                    for col in range(1, ws.max_column + 1):
-                        cell_value = ws.cell(row=1, column=col).value
-                        if cell_value and str(cell_value).strip() == col_name:
-                            title_col = col
-                            break
-                    if title_col:
-                        break
-            
-            if title_col is None:
-                return ""
-            
-            # Acessar a célula específica (row_index + 2 porque pandas é 0-indexed e há header)
-            cell = ws.cell(row=row_index + 2, column=title_col)
-            
-            # Verificar se há hyperlink
-            if cell.hyperlink and cell.hyperlink.target:
-                # Limpar o link removendo caracteres especiais se necessário
-                link = str(cell.hyperlink.target).strip()
-                return link
-            
-            return ""
-            
+            if workbook is None:
+                workbook = ParsedWorkbook(file_path)
+            return workbook.title_links(col_name)
         except Exception as e:
-            print(f"Erro ao extrair link do VPCR Title na linha {row_index + 1}: {e}")
-            return ""
+            print(f"Erro ao extrair links do VPCR Title: {e}")
+            return {}
 
-    def import_from_excel(self, file_path, progress_callback=None):
-        """Importa dados do Excel comparando com dados existentes e gerando logs apenas para mudanças"""
-        try:
-            import pandas as pd
-            import time
-            
-            # Ler o arquivo Excel com detecção robusta de formato
-            def detect_excel_format(file_path):
-                """Detecta o formato real do arquivo Excel baseado no conteúdo"""
-                try:
-                    with open(file_path, 'rb') as f:
-                        header = f.read(8)
-                        
-                    # Arquivos .xlsx/.xlsm são ZIP (começam com PK)
-                    if header.startswith(b'PK'):
-                        return 'openpyxl'
-                    # Arquivos .xls verdadeiros têm assinatura específica
-                    elif header.startswith(b'\xd0\xcf\x11\xe0') or header.startswith(b'\x09\x08'):
-                        return 'xlrd'
-                    # Se começar com <?xml, é XML mascarado como .xls
-                    elif header.startswith(b'<?xml'):
-                        return 'openpyxl'
-                    else:
-                        # Fallback: tentar openpyxl primeiro (mais comum)
-                        return 'openpyxl'
-                except Exception:
-                    return 'openpyxl'
-            
-            # Verificar se arquivo existe
-            if not os.path.exists(file_path):
-                raise Exception(f"Arquivo não encontrado: {file_path}")
+    def extract_vpcr_title_link(self, file_path, row_index, col_name="VPCR Title"):
+        """Extrai o link incorporado no campo VPCR Title de uma única linha.
+
+        Para importações use extract_vpcr_title_links, que lê o arquivo apenas uma vez.
+        """
+        return self.extract_vpcr_title_links(file_path, col_name).get(row_index, "")
+
+    @staticmethod
+    def _fetch_items(cursor, sql, params=()):
+        """Executa a consulta e retorna as linhas como dicts {coluna: valor}"""
+        cursor.execute(sql, params)
+        columns = [description[0] for description in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def _load_padded_items(self, cursor):
+        """Itens gravados com espaços ao redor do ID (percorre a tabela: uma vez por importação)"""
+        return self._fetch_items(cursor, "SELECT * FROM vpcr WHERE TRIM(vpcr, char(32, 9, 10, 13)) <> vpcr")
+
+    def _load_existing_items(self, cursor, keys=None, padded_items=None):
+        """Carrega itens da tabela vpcr em um dict indexado pelo VPCR Project ID (sem espaços nas pontas).
+
+        Sem keys carrega a tabela inteira; com keys busca apenas esses IDs (em lotes),
+        incluindo os registros gravados com espaços ao redor do ID (padded_items, de
+        _load_padded_items; consultados aqui se não forem informados).
+        """
+        if keys is None:
+            rows = self._fetch_items(cursor, 'SELECT * FROM vpcr')
+        else:
+            keys = list(keys)
+            rows = []
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ', '.join('?' for _ in batch)
+                rows.extend(self._fetch_items(cursor, f'SELECT * FROM vpcr WHERE vpcr IN ({placeholders})', batch))
+            # IDs gravados com espaços não aparecem no IN
+            if padded_items is None:
+                padded_items = self._load_padded_items(cursor)
+            rows.extend(padded_items)
+            rows.sort(key=lambda item: item['id'])
+            keys = set(keys)
+        
+        existing_items = {}
+        for item in rows:
+            key = str(item.get('vpcr') or '').strip()
+            if key and (keys is None or key in keys):
+                # Mesmo critério de get_item_by_vpcr: vale o primeiro registro encontrado
+                existing_items.setdefault(key, item)
+        return existing_items
+
+    def _plan_item_update(self, plan, existing_item, vpcr_project_id, field_changes, index, progress_callback=None):
+        """Registra no plano a atualização de um item existente.
+
+        field_changes: [(db_field, old_str, new_str, new_value)] dos campos que mudaram.
+        """
+        for db_field, old_str, new_str, new_value in field_changes:
+            plan.add_log(vpcr_project_id, db_field, old_str, new_str, 'update')
+        
+        old_closed_date = existing_item.get('closed_date', '')
+        changes = {db_field: new_value for db_field, old_str, new_str, new_value in field_changes}
+        
+        # Se status mudou para "Work Complete", definir closed_date automaticamente
+        if str(changes.get('vpcr_status', '')).strip() == 'Work Complete':
+            current_date = datetime.now().strftime('%d/%m/%Y')
+            changes['closed_date'] = current_date
+            plan.add_log(vpcr_project_id, 'closed_date', old_closed_date, current_date, 'auto_complete')
             
-            # Detectar formato e usar engine apropriado
-            engine = detect_excel_format(file_path)
+            if progress_callback:
+                progress_callback(f"Linha {index + 1}: {vpcr_project_id} - Status alterado para 'Work Complete', closed_date definido automaticamente para {current_date}")
+        
+        # Marcar como novo dado para destacar o item atualizado
+        changes['new_data'] = True
+        plan.add_update(vpcr_project_id, changes)
+        existing_item.update(changes)
+        
+        if progress_callback:
+            progress_callback(f"Linha {index + 1}: {vpcr_project_id} - {len(field_changes)} campo(s) atualizado(s)")
+
+    @classmethod
+    def prepare_import_frame(cls, workbook):
+        """Lê a planilha e normaliza as colunas mapeadas em bloco (sem acessar o banco)"""
+        return cls._prepare_frame(workbook.path, workbook.dataframe(), workbook.title_links("VPCR Title"))
+
+    @classmethod
+    def _prepare_frame(cls, path, df, title_links):
+        """Normaliza um DataFrame da planilha (arquivo inteiro ou um bloco) para o diff"""
+        import pandas as pd
+        
+        source_cols = [col for col in cls.IMPORT_COLUMN_MAPPING if col in df.columns]
+        
+        # Normalização em bloco: NaN -> "", demais valores com str() (formato original da planilha)
+        raw = df[source_cols].astype(object)
+        raw = raw.where(raw.notna(), "").apply(lambda col: col.map(str))
+        raw.columns = [cls.IMPORT_COLUMN_MAPPING[col] for col in source_cols]
+        raw['link_vpcr'] = pd.Series(title_links, dtype=object).reindex(df.index).fillna("")
+        stripped = raw.apply(lambda col: col.str.strip())
+        
+        # Chave de comparação: VPCR Project ID sem espaços; linhas sem ID são ignoradas
+        if 'VPCR Project ID' in df.columns:
+            ids = df['VPCR Project ID'].astype(object)
+            keys = ids.where(ids.notna(), "").map(str).str.strip()
+            valid = ids.notna() & (keys != "")
+        else:
+            keys = pd.Series("", index=df.index, dtype=object)
+            valid = pd.Series(False, index=df.index)
+        
+        # Hash por linha do conteúdo comparado (inclui "Last Updated Date" e o link)
+        fingerprints = pd.util.hash_pandas_object(stripped, index=False).map('{:016x}'.format)
+        
+        return PreparedImport(path, len(df), raw, stripped, keys, valid, fingerprints)
+
+    def _plan_import_frame(self, plan, existing_items, prepared, progress_callback=None, cancel_token=None):
+        """Detecta mudanças de forma vetorizada (pandas) e registra as operações no plano.
+
+        Linhas de itens já existentes são comparadas em bloco contra a tabela atual;
+        itens novos e IDs repetidos na planilha seguem pelo caminho linha a linha,
+        preservando a ordem em que as linhas aparecem.
+        """
+        import pandas as pd
+        import numpy as np
+        
+        fields = prepared.fields
+        raw, stripped, keys, valid = prepared.raw, prepared.stripped, prepared.keys, prepared.valid
+        
+        if progress_callback:
+            for index in raw.index[~valid]:
+                progress_callback(f"Linha {index + 1}: VPCR Project ID não encontrado, pulando...")
+        
+        repeated = keys.where(valid).duplicated(keep=False) & valid
+        first_occurrence = valid & ~keys.where(valid).duplicated(keep='first')
+        vectorized = first_occurrence & keys.isin(existing_items.keys())
+        
+        # Importação incremental: linhas cujo hash é igual ao da última importação não são comparadas
+        stored_fingerprints = pd.Series(None, index=keys.index, dtype=object)
+        stored_fingerprints[vectorized] = [existing_items[key].get('import_fingerprint') for key in keys[vectorized]]
+        unchanged = vectorized & pd.Series(
+            stored_fingerprints.to_numpy(dtype=object) == prepared.fingerprints.to_numpy(dtype=object), index=keys.index
+        )
+        vectorized &= ~unchanged
+        
+        if progress_callback and unchanged.any():
+            progress_callback(f"{int(unchanged.sum())} linha(s) sem alteração desde a última importação")
+        
+        if vectorized.any():
+            # Itens a comparar como DataFrame (dtype object preserva os valores exatamente como no banco)
+            current = pd.DataFrame.from_dict(
+                {key: existing_items[key] for key in keys[vectorized]}, orient='index', dtype=object
+            )
+            current = current.reindex(columns=fields).astype(object)
+            current = current.where(current.notna(), "")
+            # Mesma regra do modo linha a linha: valores "falsos" (None, '', 0) contam como vazio
+            current = current.where(~((current == "") | (current == 0)), "")
+            current = current.apply(lambda col: col.map(str).str.strip())
+            
+            # Left join da planilha com a tabela atual pela chave vpcr
+            new_keys = keys[vectorized]
+            old_values = current.reindex(new_keys.values).to_numpy(dtype=object)
+            new_values = stripped[vectorized].to_numpy(dtype=object)
+            new_raw = raw[vectorized].to_numpy(dtype=object)
+            new_index = new_keys.index
+            
+            changed = new_values != old_values
+            field_changes_by_row = {}
+            for row_pos, col_pos in zip(*np.nonzero(changed)):
+                field_changes_by_row.setdefault(row_pos, []).append(
+                    (fields[col_pos], old_values[row_pos, col_pos], new_values[row_pos, col_pos], new_raw[row_pos, col_pos])
+                )
             
-            try:
-                df = pd.read_excel(file_path, engine=engine)
-            except Exception as e:
-                # Se falhar, tentar o outro engine
-                fallback_engine = 'xlrd' if engine == 'openpyxl' else 'openpyxl'
+            for row_pos, field_changes in field_changes_by_row.items():
+                vpcr_project_id = new_keys.iat[row_pos]
+                self._plan_item_update(plan, existing_items[vpcr_project_id], vpcr_project_id, field_changes,
+                                       new_index[row_pos], progress_callback)
+        
+        # Itens novos e IDs repetidos: processamento linha a linha, na ordem da planilha
+        sequential = valid & ~vectorized
+        if sequential.any():
+            for position, (index, excel_data) in enumerate(zip(raw.index[sequential], raw[sequential].to_dict('records'))):
+                if cancel_token and position % 500 == 0:
+                    cancel_token.raise_if_cancelled()
                 try:
-                    df = pd.read_excel(file_path, engine=fallback_engine)
-                except Exception as e2:
-                    # Se ambos falharem, dar uma mensagem mais informativa
-                    error_msg = f"Não foi possível ler o arquivo Excel '{os.path.basename(file_path)}'.\n"
-                    error_msg += f"Erro com {engine}: {str(e)[:100]}...\n"
-                    error_msg += f"Erro com {fallback_engine}: {str(e2)[:100]}..."
-                    raise Exception(error_msg)
+                    self._plan_import_row(plan, existing_items, keys.at[index], excel_data, index, progress_callback)
+                except Exception as e:
+                    if progress_callback:
+                        progress_callback(f"Erro na linha {index + 1}: {e}")
+        
+        # Guardar o hash das linhas comparadas. O hash fica vazio quando o banco não ficou igual
+        # à planilha (closed_date automático) ou quando o ID se repete, forçando nova comparação
+        for index in raw.index[first_occurrence & ~unchanged]:
+            key = keys.at[index]
+            if key not in existing_items:
+                continue  # Linha com erro, não planejada
+            fingerprint = None if repeated.at[index] else prepared.fingerprints.at[index]
+            written = plan.inserts.get(key) or plan.updates.get(key) or {}
+            if 'closed_date' in fields and written.get('closed_date', raw.at[index, 'closed_date']) != raw.at[index, 'closed_date']:
+                fingerprint = None
+            if fingerprint != existing_items[key].get('import_fingerprint'):
+                plan.set_fingerprint(key, fingerprint)
+                existing_items[key]['import_fingerprint'] = fingerprint
+
+    def _plan_import_row(self, plan, existing_items, vpcr_project_id, excel_data, index, progress_callback=None):
+        """Compara uma linha da planilha com o estado atual e registra as operações no plano"""
+        existing_item = existing_items.get(vpcr_project_id)
+        
+        if existing_item:
+            # Item existe - verificar se há mudanças
+            field_changes = []
+            
+            for db_field, new_value in excel_data.items():
+                old_value = existing_item.get(db_field, '')
+                # Normalizar valores para comparação
+                old_str = str(old_value).strip() if old_value else ''
+                new_str = str(new_value).strip() if new_value else ''
+                
+                if old_str != new_str:
+                    field_changes.append((db_field, old_str, new_str, new_value))
             
-            # Mapear colunas do Excel para campos do banco
-            column_mapping = {
-                'VPCR Project ID': 'vpcr',  # Campo chave para comparação
-                'VPCR Title': 'vpcr_title',
-                'Initiated Date': 'initiated_date',
-                'Last Updated Date': 'last_update',
-                'Closed Date': 'closed_date',
-                'Category 3 (Group)': 'category_3_group',
-                'Current Supplier': 'current_supplier',
-                'Affected Items': 'items_affected',
-                'Plants Affected - Post CPIF Integration': 'plants_affected',
-                'VPCR Requestor': 'vpcr_requestor',
-                'Sourcing Manager': 'sourcing_manager',
-                'SQIE(s)': 'sqie_s',
-                'VPCR Status': 'vpcr_status',
-                'Type of VPCR': 'type_of_vpcr',
-                'Proposed Supplier': 'proposed_supplier',
-                'Category 2 (Area)': 'category_2_area',
-                'Supporting Documentation': 'supporting_documentation',
-                'Project Editor': 'project_editor',
-                'Change Manager': 'change_manager',
-                'Desired Production Date at Affected Plant(s)': 'desired_production_date',
-                'SCR Item ID': 'scr_item_id'
-            }
+            if field_changes:
+                self._plan_item_update(plan, existing_item, vpcr_project_id, field_changes, index, progress_callback)
+            elif progress_callback:
+                progress_callback(f"Linha {index + 1}: {vpcr_project_id} - Sem alterações")
+        else:
+            # Item novo - verificar se já vem com status "Work Complete"
+            if excel_data.get('vpcr_status', '').strip() == 'Work Complete' and not excel_data.get('closed_date', '').strip():
+                # Se status é "Work Complete" mas não tem closed_date, definir automaticamente
+                current_date = datetime.now().strftime('%d/%m/%Y')
+                excel_data['closed_date'] = current_date
+                if progress_callback:
+                    progress_callback(f"Linha {index + 1}: {vpcr_project_id} - Novo item com status 'Work Complete', closed_date definido automaticamente para {current_date}")
+            
+            # Item novo - inserir marcado como novo dado e registrar log "initial input"
+            new_item = dict(excel_data)
+            new_item['new_data'] = True
+            plan.add_insert(vpcr_project_id, new_item)
+            existing_items[vpcr_project_id] = new_item
+            plan.add_log(vpcr_project_id, 'ITEM_CREATED', '', 'initial input', 'create')
+            
+            # Se closed_date foi definido automaticamente, registrar também esse log
+            if excel_data.get('vpcr_status', '').strip() == 'Work Complete' and excel_data.get('closed_date'):
+                plan.add_log(vpcr_project_id, 'closed_date', '', excel_data['closed_date'], 'auto_complete')
             
-            # Garantir que todas as colunas necessárias existam na tabela vpcr
-            for excel_col, db_field in column_mapping.items():
-                self.ensure_column_exists('vpcr', db_field, 'TEXT')
+            if progress_callback:
+                progress_callback(f"Linha {index + 1}: {vpcr_project_id} - Novo item criado")
+
+    def _execute_plan_ops(self, cursor, plan, keys):
+        """Executa INSERTs, UPDATEs e logs do plano para as chaves informadas usando executemany"""
+        # Agrupar por conjunto de colunas para reutilizar o mesmo comando SQL
+        insert_groups = {}
+        update_groups = {}
+        log_rows = []
+        
+        for key in keys:
+            if key in plan.inserts:
+                data = dict(plan.inserts[key])
+                if key in plan.fingerprints:
+                    data['import_fingerprint'] = plan.fingerprints[key]
+                fields = tuple(data.keys())
+                insert_groups.setdefault(fields, []).append(tuple(data[f] for f in fields))
+            elif key in plan.updates or key in plan.fingerprints:
+                changes = dict(plan.updates.get(key, {}))
+                if key in plan.fingerprints:
+                    changes['import_fingerprint'] = plan.fingerprints[key]
+                fields = tuple(changes.keys())
+                update_groups.setdefault(fields, []).append(tuple(changes[f] for f in fields) + (plan.row_ids.get(key, key),))
+            log_rows.extend(plan.logs.get(key, []))
+        
+        for fields, rows in insert_groups.items():
+            placeholders = ', '.join(['?' for _ in fields])
+            cursor.executemany(f'INSERT INTO vpcr ({", ".join(fields)}) VALUES ({placeholders})', rows)
+        
+        for fields, rows in update_groups.items():
+            assignments = ', '.join(f'{field} = ?' for field in fields)
+            cursor.executemany(f'UPDATE vpcr SET {assignments} WHERE vpcr = ?', rows)
+        
+        # PNs e plantas gravados/alterados: atualizar as tabelas normalizadas
+        list_changes = {}
+        for key in keys:
+            data = plan.inserts.get(key) or plan.updates.get(key) or {}
+            values = {column: data[column] for column in self.LIST_TABLES if column in data}
+            if values:
+                list_changes[plan.row_ids.get(key, key)] = values
+        self._sync_item_lists(cursor, list_changes)
+        
+        self.change_log.write(cursor, log_rows)
+
+    def _apply_import_plan(self, cursor, plan, progress_callback=None):
+        """Aplica o plano em lote; se o lote falhar, reaplica item a item isolando os que falharem.
+
+        Deve ser chamado dentro de uma transação aberta. Retorna o conjunto de chaves não gravadas.
+        """
+        try:
+            cursor.execute('SAVEPOINT import_batch')
+            self._execute_plan_ops(cursor, plan, plan.keys)
+            cursor.execute('RELEASE SAVEPOINT import_batch')
+            return set()
+        except sqlite3.Error as e:
+            cursor.execute('ROLLBACK TO SAVEPOINT import_batch')
+            cursor.execute('RELEASE SAVEPOINT import_batch')
+            print(f"Falha na gravação em lote, reaplicando item a item: {e}")
+        
+        failed_keys = set()
+        for key in plan.keys:
+            try:
+                cursor.execute('SAVEPOINT import_item')
+                self._execute_plan_ops(cursor, plan, [key])
+                cursor.execute('RELEASE SAVEPOINT import_item')
+            except sqlite3.Error as e:
+                cursor.execute('ROLLBACK TO SAVEPOINT import_item')
+                cursor.execute('RELEASE SAVEPOINT import_item')
+                failed_keys.add(key)
+                if progress_callback:
+                    progress_callback(f"Erro ao gravar {key}: {e}")
+        return failed_keys
+
+    def import_from_excel(self, file_path, progress_callback=None, workbook=None, prepared=None, cancel_token=None):
+        """Importa dados do Excel comparando com dados existentes e gerando logs apenas para mudanças.
+
+        workbook: ParsedWorkbook já lido (ex.: na validação) para não ler o arquivo novamente.
+        prepared: PreparedImport já normalizado (ex.: pelo ImportPipeline), dispensando a leitura.
+        cancel_token: CancellationToken; se cancelado, a transação do arquivo é desfeita por inteiro.
+        """
+        try:
+            if prepared is None and workbook is None:
+                # Verificar se arquivo existe
+                if not os.path.exists(file_path):
+                    raise Exception(f"Arquivo não encontrado: {file_path}")
+                workbook = ParsedWorkbook(file_path)
             
-            # Garantir que colunas adicionais também existam
-            self.ensure_column_exists('vpcr', 'new_data', 'BOOLEAN DEFAULT 0')
-            self.ensure_column_exists('vpcr', 'link_vpcr', 'TEXT')
+            # Planilhas muito grandes são lidas e comparadas em blocos (DataFrame de tamanho limitado)
+            streaming = prepared is None and workbook.use_streaming
+            if prepared is None and not streaming:
+                # Ler o arquivo Excel (engine detectado pelo conteúdo, com fallback) e normalizar
+                prepared = self.prepare_import_frame(workbook)
             
-            imported_count = 0
-            updated_count = 0
-            logs_created = 0
-            total_rows = len(df)
-            updated_items = []  # Lista para rastrear itens atualizados
+            total_rows = workbook.estimated_rows if streaming else prepared.total_rows
             
             if progress_callback:
                 progress_callback(f"Iniciando processamento de {total_rows} linhas...")
             
-            # Processar linha por linha
-            for index, row in df.iterrows():
-                try:
-                    # Obter o VPCR Project ID da planilha
-                    vpcr_project_id = row.get('VPCR Project ID')
-                    
-                    if pd.isna(vpcr_project_id) or not str(vpcr_project_id).strip():
-                        if progress_callback:
-                            progress_callback(f"Linha {index + 1}: VPCR Project ID não encontrado, pulando...")
-                        continue
-                    
-                    vpcr_project_id = str(vpcr_project_id).strip()
-                    
-                    # Preparar dados da planilha (salvando exatamente como está na planilha)
-                    excel_data = {}
-                    for excel_col, db_field in column_mapping.items():
-                        if excel_col in row:
-                            value = row[excel_col]
-                            
-                            # Apenas tratar valores NaN (converter para string vazia)
-                            if pd.isna(value):
-                                value = ""
-                            else:
-                                # Converter para string mantendo formato original da planilha
-                                value = str(value)
-                            
-                            excel_data[db_field] = value
+            # Leitura e comparação antes da transação de escrita: o bloqueio de escrita do banco
+            # (que faria a interface esperar ao clicar em um card) fica apenas com as gravações
+            conn = self.get_connection('import_from_excel')
+            try:
+                cursor = conn.cursor()
+                change_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                plan = ImportPlan(change_date)
+                existing_items = {}
+                
+                # Transação de leitura: todos os blocos são comparados com o mesmo estado do banco
+                cursor.execute('BEGIN')
+                version = self._item_change_version(cursor)
+                if streaming:
+                    title_links = workbook.title_links("VPCR Title")
+                    frames = (self._prepare_frame(file_path, df, title_links) for df in workbook.iter_dataframes())
+                    padded_items = self._load_padded_items(cursor)
+                else:
+                    frames = [prepared]
+                    padded_items = None
+                
+                processed_rows = 0
+                for frame in frames:
+                    if cancel_token:
+                        cancel_token.raise_if_cancelled()
                     
-                    # Extrair link do campo VPCR Title e salvar no campo link_vpcr
-                    vpcr_title_link = self.extract_vpcr_title_link(file_path, index, "VPCR Title")
-                    if vpcr_title_link:
-                        excel_data['link_vpcr'] = vpcr_title_link
+                    # Em blocos, carregar apenas os itens do bloco ainda não vistos em blocos anteriores
+                    # (esses já estão em existing_items com as alterações planejadas)
+                    if streaming:
+                        keys = [key for key in frame.keys[frame.valid].unique() if key not in existing_items]
                     else:
-                        excel_data['link_vpcr'] = ""
+                        keys = None
+                    loaded = self._load_existing_items(cursor, keys, padded_items)
+                    existing_items.update(loaded)
+                    # Itens gravados com espaços no ID: UPDATEs usam o valor exato da coluna vpcr
+                    plan.row_ids.update({key: item['vpcr'] for key, item in loaded.items() if item['vpcr'] != key})
                     
-                    # Verificar se item já existe no banco (comparar com coluna 'vpcr')
-                    existing_item = self.get_item_by_vpcr(vpcr_project_id)
+                    self._plan_import_frame(plan, existing_items, frame, progress_callback, cancel_token)
                     
-                    conn = None
-                    try:
-                        conn = self.get_connection()
-                        cursor = conn.cursor()
-                        cursor.execute('BEGIN IMMEDIATE')
-                        
-                        if existing_item:
-                            # Item existe - verificar se há mudanças
-                            changes_found = False
-                            field_changes = []
-                            
-                            for db_field, new_value in excel_data.items():
-                                old_value = existing_item.get(db_field, '')
-                                # Normalizar valores para comparação
-                                old_str = str(old_value).strip() if old_value else ''
-                                new_str = str(new_value).strip() if new_value else ''
-                                
-                                if old_str != new_str:
-                                    changes_found = True
-                                    field_changes.append((db_field, old_value, new_value))
-                                    
-                                    # Registrar log da mudança
-                                    local_datetime = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                                    cursor.execute('''
-                                        INSERT INTO log_table (item_id, field_name, old_value, new_value, change_type, change_date)
-                                        VALUES (?, ?, ?, ?, ?, ?)
-                                    ''', (vpcr_project_id, db_field, old_str, new_str, 'update', local_datetime))
-                                    logs_created += 1
-                            
-                            if changes_found:
-                                # Verificar se houve mudança de status para "Work Complete"
-                                status_changed_to_complete = False
-                                for db_field, old_val, new_val in field_changes:
-                                    if db_field == 'vpcr_status' and str(new_val).strip() == 'Work Complete':
-                                        status_changed_to_complete = True
-                                        break
-                                
-                                # Atualizar apenas campos que mudaram
-                                update_fields = []
-                                update_values = []
-                                
-                                for db_field, old_val, new_val in field_changes:
-                                    update_fields.append(f'{db_field} = ?')
-                                    update_values.append(new_val)
-                                
-                                # Se status mudou para "Work Complete", definir closed_date automaticamente
-                                if status_changed_to_complete:
-                                    current_date = datetime.now().strftime('%d/%m/%Y')
-                                    update_fields.append('closed_date = ?')
-                                    update_values.append(current_date)
-                                    
-                                    # Registrar log da mudança automática do closed_date
-                                    local_datetime = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                                    old_closed_date = existing_item.get('closed_date', '')
-                                    cursor.execute('''
-                                        INSERT INTO log_table (item_id, field_name, old_value, new_value, change_type, change_date)
-                                        VALUES (?, ?, ?, ?, ?, ?)
-                                    ''', (vpcr_project_id, 'closed_date', old_closed_date, current_date, 'auto_complete', local_datetime))
-                                    logs_created += 1
-                                    
-                                    if progress_callback:
-                                        progress_callback(f"Linha {index + 1}: {vpcr_project_id} - Status alterado para 'Work Complete', closed_date definido automaticamente para {current_date}")
-                                
-                                if update_fields:
-                                    # Adicionar new_data=True para itens atualizados
-                                    update_fields.append("new_data = ?")
-                                    update_values.append(True)
-                                    
-                                    update_sql = f'UPDATE vpcr SET {", ".join(update_fields)} WHERE vpcr = ?'
-                                    update_values.append(vpcr_project_id)
-                                    cursor.execute(update_sql, update_values)
-                                
-                                updated_count += 1
-                                updated_items.append(vpcr_project_id)  # Adicionar à lista de atualizados
-                                if progress_callback:
-                                    progress_callback(f"Linha {index + 1}: {vpcr_project_id} - {len(field_changes)} campo(s) atualizado(s)")
-                            else:
-                                if progress_callback:
-                                    progress_callback(f"Linha {index + 1}: {vpcr_project_id} - Sem alterações")
-                        else:
-                            # Item novo - verificar se já vem com status "Work Complete"
-                            if excel_data.get('vpcr_status', '').strip() == 'Work Complete' and not excel_data.get('closed_date', '').strip():
-                                # Se status é "Work Complete" mas não tem closed_date, definir automaticamente
-                                current_date = datetime.now().strftime('%d/%m/%Y')
-                                excel_data['closed_date'] = current_date
-                                if progress_callback:
-                                    progress_callback(f"Linha {index + 1}: {vpcr_project_id} - Novo item com status 'Work Complete', closed_date definido automaticamente para {current_date}")
-                            
-                            # Item novo - inserir e registrar log "initial input"
-                            fields = list(excel_data.keys())
-                            # Adicionar new_data como True para itens novos
-                            fields.append('new_data')
-                            placeholders = ', '.join(['?' for _ in fields])
-                            field_names = ', '.join(fields)
-                            values = list(excel_data.values())
-                            values.append(True)  # Marcar como novo
-                            
-                            insert_sql = f'INSERT INTO vpcr ({field_names}) VALUES ({placeholders})'
-                            cursor.execute(insert_sql, values)
-                            
-                            # Registrar log "initial input"
-                            local_datetime = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                            cursor.execute('''
-                                INSERT INTO log_table (item_id, field_name, old_value, new_value, change_type, change_date)
-                                VALUES (?, ?, ?, ?, ?, ?)
-                            ''', (vpcr_project_id, 'ITEM_CREATED', '', 'initial input', 'create', local_datetime))
-                            logs_created += 1
-                            
-                            # Se closed_date foi definido automaticamente, registrar também esse log
-                            if excel_data.get('vpcr_status', '').strip() == 'Work Complete' and excel_data.get('closed_date'):
-                                cursor.execute('''
-                                    INSERT INTO log_table (item_id, field_name, old_value, new_value, change_type, change_date)
-                                    VALUES (?, ?, ?, ?, ?, ?)
-                                ''', (vpcr_project_id, 'closed_date', '', excel_data['closed_date'], 'auto_complete', local_datetime))
-                                logs_created += 1
-                            
-                            imported_count += 1
-                            if progress_callback:
-                                progress_callback(f"Linha {index + 1}: {vpcr_project_id} - Novo item criado")
-                        
-                        conn.commit()
-                        
-                    except Exception as e:
-                        if conn:
-                            conn.rollback()
-                        raise e
-                    finally:
-                        if conn:
-                            conn.close()
-                            
-                except Exception as e:
+                    processed_rows += frame.total_rows
                     if progress_callback:
-                        progress_callback(f"Erro na linha {index + 1}: {e}")
-                    continue
+                        progress_callback(f"Processadas {processed_rows}/{max(total_rows, processed_rows)} linhas...")
+                conn.commit()
+                
+                if cancel_token:
+                    cancel_token.raise_if_cancelled()
                 
-                # Atualizar progresso
-                if progress_callback and (index + 1) % 5 == 0:
-                    progress_callback(f"Processadas {index + 1}/{total_rows} linhas...")
+                # Uma única transação de escrita por arquivo: cancelar ou falhar não deixa o arquivo pela metade
+                cursor.execute('BEGIN IMMEDIATE')
+                # Itens alterados por outra conexão durante a leitura: o hash fica vazio para que a
+                # próxima importação compare o item por completo
+                conflicts = self._changed_item_ids_since(cursor, version)
+                for key in list(plan.keys):
+                    if conflicts is None or plan.row_ids.get(key, key) in conflicts:
+                        plan.set_fingerprint(key, None)
+                
+                failed_keys = self._apply_import_plan(cursor, plan, progress_callback)
+                imported_count, updated_count, logs_created, updated_items = plan.summary(failed_keys)
+                
+                # Última verificação antes do commit: cancelar aqui não deixa o arquivo pela metade
+                if cancel_token:
+                    cancel_token.raise_if_cancelled()
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
             
             if progress_callback:
                 progress_callback(f"✅ Importação concluída: {imported_count} novos, {updated_count} atualizados, {logs_created} logs criados")
@@ -1587,9 +3408,23 @@ class DatabaseManager:
                 'updated': updated_count,
                 'logs_created': logs_created,
                 'total_processed': imported_count + updated_count,
-                'updated_items': updated_items
+                'updated_items': updated_items,
+                'failed_items': sorted(failed_keys),
+                'total_rows': processed_rows
             }
             
+        except ImportCancelled as e:
+            if progress_callback:
+                progress_callback(f"⏹ Importação cancelada: {os.path.basename(file_path)}")
+            return {
+                'success': False,
+                'cancelled': True,
+                'error': str(e),
+                'imported': 0,
+                'updated': 0,
+                'logs_created': 0,
+                'total_processed': 0
+            }
         except Exception as e:
             if progress_callback:
                 progress_callback(f"❌ Erro na importação: {e}")
@@ -1602,82 +3437,124 @@ class DatabaseManager:
                 'total_processed': 0
             }
     
-    def get_all_items(self):
-        """Retorna todos os itens do banco de dados"""
-        with self.get_connection() as conn:
+    def get_all_items(self):
+        """Retorna todos os itens do banco de dados como ItemRecord"""
+        with self.get_connection('get_all_items') as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM vpcr')
+            columns = [description[0] for description in cursor.description]
+            rows = cursor.fetchall()
+            
+            # Converter para o formato esperado pela aplicação (ItemRecord, acesso por chave como dict)
+            return [ItemRecord.from_row(columns, row) for row in rows]
+    
+
+
+    @staticmethod
+    def _item_change_version(cursor):
+        # sqlite_sequence não diminui quando versões antigas são removidas (prune_item_changes)
+        row = cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'vpcr_changes'").fetchone()
+        return row[0] if row else 0
+    
+    @staticmethod
+    def _changed_item_ids_since(cursor, version):
+        """IDs (vpcr) alterados após a versão informada, ou None se o histórico já foi podado"""
+        if DatabaseManager._item_change_version(cursor) <= version:
+            return set()
+        oldest = cursor.execute('SELECT MIN(version) FROM vpcr_changes').fetchone()[0]
+        if oldest is None or oldest > version + 1:
+            return None
+        cursor.execute('SELECT DISTINCT vpcr FROM vpcr_changes WHERE version > ?', (version,))
+        return {row[0] for row in cursor.fetchall()}
+    
+    def get_item_change_version(self):
+        """Versão atual da tabela vpcr (registrar antes de carregar os itens com get_all_items)"""
+        with self.get_connection('get_item_change_version') as conn:
+            return self._item_change_version(conn.cursor())
+    
+    def get_item_changes_since(self, version, batch_size=500):
+        """Itens alterados desde a versão informada.
+        
+        Retorna (nova_versão, [ItemRecord alterados/novos], {IDs removidos}), ou None quando
+        as versões necessárias já foram removidas por prune_item_changes (recarregar tudo).
+        """
+        with self.get_connection('get_item_changes_since') as conn:
+            cursor = conn.cursor()
+            # Transação de leitura: versão, IDs e linhas vêm do mesmo instante do banco
+            cursor.execute('BEGIN')
+            current_version = self._item_change_version(cursor)
+            if current_version <= version:
+                conn.commit()
+                return current_version, [], set()
+            
+            oldest = cursor.execute('SELECT MIN(version) FROM vpcr_changes').fetchone()[0]
+            if oldest is None or oldest > version + 1:
+                conn.commit()
+                return None
+            
+            cursor.execute(
+                'SELECT DISTINCT vpcr FROM vpcr_changes WHERE version > ? AND version <= ?',
+                (version, current_version)
+            )
+            changed_ids = [row[0] for row in cursor.fetchall() if row[0] is not None]
+            
+            records = []
+            for start in range(0, len(changed_ids), batch_size):
+                batch = changed_ids[start:start + batch_size]
+                placeholders = ', '.join('?' for _ in batch)
+                cursor.execute(f'SELECT * FROM vpcr WHERE vpcr IN ({placeholders})', batch)
+                columns = [description[0] for description in cursor.description]
+                records.extend(ItemRecord.from_row(columns, row) for row in cursor.fetchall())
+            conn.commit()
+        
+        found = {record.vpcr for record in records}
+        return current_version, records, {item_id for item_id in changed_ids if item_id not in found}
+    
+    def prune_item_changes(self, older_than_days=30):
+        """Remove versões antigas de vpcr_changes (chamado pela manutenção)"""
+        cutoff = (datetime.now() - timedelta(days=older_than_days)).strftime('%Y-%m-%d %H:%M:%S')
+        with self.get_connection('prune_item_changes') as conn:
             cursor = conn.cursor()
-            cursor.execute('SELECT * FROM vpcr')
-            columns = [description[0] for description in cursor.description]
-            rows = cursor.fetchall()
+            cursor.execute('DELETE FROM vpcr_changes WHERE changed_at < ?', (cutoff,))
+            conn.commit()
+            return cursor.rowcount
+    
+    def get_change_log_page(self, item_id, limit=50, before=None):
+        """Página do log de um item, do mais recente para o mais antigo (paginação por chave).
+        
+        before é o cursor (change_date, id) retornado pela página anterior. Retorna
+        (registros, cursor da próxima página, há mais registros).
+        """
+        with self.get_connection('get_change_log_page') as conn:
+            cursor = conn.cursor()
+            if before is None:
+                cursor.execute('''
+                    SELECT id, item_id, field_name, old_value, new_value, change_date, change_type
+                    FROM log_table
+                    WHERE item_id = ?
+                    ORDER BY change_date DESC, id DESC
+                    LIMIT ?
+                ''', (item_id, limit + 1))
+            else:
+                cursor.execute('''
+                    SELECT id, item_id, field_name, old_value, new_value, change_date, change_type
+                    FROM log_table
+                    WHERE item_id = ? AND (change_date, id) < (?, ?)
+                    ORDER BY change_date DESC, id DESC
+                    LIMIT ?
+                ''', (item_id, before[0], before[1], limit + 1))
             
-            # Converter para o formato esperado pela aplicação
-            formatted_items = []
-            for row in rows:
-                item_dict = dict(zip(columns, row))
-                # Mapear campos do banco para o formato esperado
-                formatted_item = {
-                    'ID': item_dict.get('vpcr', ''),
-                    'vpcr': item_dict.get('vpcr', ''),  # Campo VPCR para o título do card
-                    'Title': item_dict.get('vpcr_title', ''),
-                    'Initiated Date': item_dict.get('initiated_date', ''),
-                    'Last Update': item_dict.get('last_update', ''),
-                    'Closed Date': item_dict.get('closed_date', ''),
-                    'Category': item_dict.get('category_3_group', ''),
-                    'Supplier': item_dict.get('current_supplier', ''),
-                    'PNs': item_dict.get('items_affected', ''),
-                    'Plants Affected': item_dict.get('plants_affected', ''),
-                    'Requestor': item_dict.get('vpcr_requestor', ''),
-                    'Sourcing Manager': item_dict.get('sourcing_manager', ''),
-                    'SQIE': item_dict.get('sqie_s', ''),
-                    'Continuity': item_dict.get('continuity', ''),
-                    'Status': item_dict.get('vpcr_status', ''),
-                    'RFQ': item_dict.get('rfq', ''),
-                    'DRA': item_dict.get('dra', ''),
-                    'DQR': item_dict.get('dqr', ''),
-                    'LOI': item_dict.get('loi', ''),
-                    'Tooling': item_dict.get('tooling', ''),
-                    'Drawing': item_dict.get('drawing', ''),
-                    'PO Alfa': item_dict.get('po_alfa', ''),
-                    'SR': item_dict.get('sr_roc', ''),
-                    'Deviation': item_dict.get('deviation', ''),
-                    'PO Beta': item_dict.get('po_beta', ''),
-                    'PPAP': item_dict.get('ppap', ''),
-                    'GBPA': item_dict.get('gbpa', ''),
-                    'EDI': item_dict.get('edi', ''),
-                    'SCR': item_dict.get('scr_item_id', ''),
-                    'Comments': item_dict.get('comments', ''),
-                    'Log': item_dict.get('log', ''),
-                    'Link': item_dict.get('link_vpcr', ''),
-                    'Type of VPCR': item_dict.get('type_of_vpcr', ''),
-                    'Current Supplier': item_dict.get('current_supplier', ''),
-                    'Proposed Supplier': item_dict.get('proposed_supplier', ''),
-                    'Category 3 (Group)': item_dict.get('category_3_group', ''),
-                    'Category 2 (Area)': item_dict.get('category_2_area', ''),
-                    'Supporting Documentation': item_dict.get('supporting_documentation', ''),
-                    'Project Editor': item_dict.get('project_editor', ''),
-                    'Change Manager': item_dict.get('change_manager', ''),
-                    'Affected Items': item_dict.get('items_affected', ''),
-                    'Desired Production Date at Affected Plant(s)': item_dict.get('desired_production_date', ''),
-                    'SCR Item ID': item_dict.get('scr_item_id', ''),
-                    'new_data': item_dict.get('new_data', False)
-                }
-                
-                # Processar campos que devem ser listas (quebrados por ;)
-                for field in ['PNs', 'Plants Affected']:
-                    if formatted_item[field]:
-                        # Quebrar por ";" e criar lista limpa
-                        items_list = [item.strip() for item in formatted_item[field].split(';') if item.strip()]
-                        # Manter como string formatada para compatibilidade
-                        formatted_item[field] = '; '.join(items_list) if items_list else ''
-                formatted_items.append(formatted_item)
-            
-            return formatted_items
+            columns = [description[0] for description in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        next_cursor = (rows[-1]['change_date'], rows[-1]['id']) if rows else before
+        return rows, next_cursor, has_more
     
-
-
     def get_change_log(self, item_id=None, limit=100):
         """Retorna o log de alterações"""
-        with self.get_connection() as conn:
+        with self.get_connection('get_change_log') as conn:
             cursor = conn.cursor()
             if item_id:
                 cursor.execute('''
@@ -1697,6 +3574,392 @@ class DatabaseManager:
             rows = cursor.fetchall()
             return [dict(zip(columns, row)) for row in rows]
 
+    # Mesmo esquema do log_table principal, usado no banco de arquivo
+    ARCHIVE_LOG_SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS archive.log_table (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            item_id TEXT NOT NULL,
+            field_name TEXT NOT NULL,
+            old_value TEXT,
+            new_value TEXT,
+            change_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            change_type TEXT DEFAULT 'update',
+            source_id INTEGER
+        )
+    '''
+    LOG_COLUMNS = 'item_id, field_name, old_value, new_value, change_date, change_type'
+    
+    def archive_logs(self, older_than_days, batch_size=5000):
+        """Move para o banco de arquivo os registros do log mais antigos que older_than_days.
+        
+        Em WAL uma transação com ATTACH não é atômica entre os dois arquivos, então cada lote
+        é primeiro copiado (commit no arquivo) e só depois removido do banco principal,
+        apenas para os ids que o arquivo já contém (source_id). Uma interrupção entre os dois
+        passos deixa o lote nos dois bancos; a próxima execução ignora as cópias já feitas e
+        conclui a remoção. Retorna a quantidade movida.
+        """
+        cutoff = (datetime.now() - timedelta(days=older_than_days)).strftime('%Y-%m-%d %H:%M:%S')
+        moved = 0
+        conn = self.get_connection('archive_logs')
+        try:
+            cursor = conn.cursor()
+            cursor.execute('ATTACH DATABASE ? AS archive', (self.archive_path,))
+            try:
+                cursor.execute(self.ARCHIVE_LOG_SCHEMA)
+                # Arquivos criados antes da coluna source_id (id do registro no banco principal)
+                cursor.execute('PRAGMA archive.table_info(log_table)')
+                if 'source_id' not in {column[1] for column in cursor.fetchall()}:
+                    cursor.execute('ALTER TABLE archive.log_table ADD COLUMN source_id INTEGER')
+                cursor.execute('CREATE INDEX IF NOT EXISTS archive.idx_log_item_date ON log_table (item_id, change_date)')
+                cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS archive.idx_log_source ON log_table (source_id)')
+                conn.commit()
+                
+                while True:
+                    # Limite do lote pelo id, usando o índice de change_date
+                    cursor.execute('''
+                        SELECT MAX(id) FROM (
+                            SELECT id FROM main.log_table WHERE change_date < ? ORDER BY id LIMIT ?
+                        )
+                    ''', (cutoff, batch_size))
+                    max_id = cursor.fetchone()[0]
+                    if max_id is None:
+                        break
+                    
+                    # 1) Copiar: source_id é único, registros já copiados são ignorados
+                    cursor.execute('BEGIN IMMEDIATE')
+                    cursor.execute(f'''
+                        INSERT OR IGNORE INTO archive.log_table ({self.LOG_COLUMNS}, source_id)
+                        SELECT {self.LOG_COLUMNS}, id FROM main.log_table
+                        WHERE change_date < ? AND id <= ? ORDER BY id
+                    ''', (cutoff, max_id))
+                    conn.commit()
+                    
+                    # 2) Remover do banco principal apenas o que o arquivo já contém
+                    cursor.execute('BEGIN IMMEDIATE')
+                    cursor.execute('''
+                        DELETE FROM main.log_table
+                        WHERE change_date < ? AND id <= ?
+                          AND id IN (SELECT source_id FROM archive.log_table WHERE source_id <= ?)
+                    ''', (cutoff, max_id, max_id))
+                    moved += cursor.rowcount
+                    conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.execute('DETACH DATABASE archive')
+        finally:
+            conn.close()
+        return moved
+    
+    def _open_archive(self):
+        """Conexão direta com o banco de arquivo (None se ainda não existir)"""
+        if not os.path.exists(self.archive_path):
+            return None
+        return sqlite3.connect(self.archive_path, timeout=30.0)
+    
+    def has_archived_logs(self, item_id):
+        """Verifica se o item tem registros no log arquivado"""
+        conn = self._open_archive()
+        if conn is None:
+            return False
+        try:
+            row = conn.execute('SELECT 1 FROM log_table WHERE item_id = ? LIMIT 1', (item_id,)).fetchone()
+            return row is not None
+        except sqlite3.Error as e:
+            print(f"Erro ao consultar log arquivado: {e}")
+            return False
+        finally:
+            conn.close()
+    
+    def get_archived_change_log(self, item_id, limit=100):
+        """Retorna o log arquivado de um item, do mais recente para o mais antigo"""
+        conn = self._open_archive()
+        if conn is None:
+            return []
+        try:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM log_table 
+                WHERE item_id = ? 
+                ORDER BY change_date DESC 
+                LIMIT ?
+            ''', (item_id, limit))
+            columns = [description[0] for description in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        finally:
+            conn.close()
+    
+    def checkpoint_wal(self):
+        """Transfere o WAL para o banco e trunca o arquivo -wal"""
+        with self.get_connection('checkpoint_wal') as conn:
+            return conn.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()
+    
+    def free_page_ratio(self):
+        """Fração de páginas livres no arquivo (espaço recuperável por VACUUM)"""
+        with self.get_connection('free_page_ratio') as conn:
+            page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+            freelist_count = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            return freelist_count / page_count if page_count else 0.0
+    
+    def vacuum(self):
+        """Reescreve o banco liberando as páginas livres"""
+        with self.get_connection('vacuum') as conn:
+            conn.execute('VACUUM')
+
+
+class MaintenanceManager:
+    """Manutenção do banco executada em segundo plano enquanto o aplicativo está ocioso.
+
+    Após idle_seconds sem uso do banco: arquiva o log mais antigo que archive_after_days e
+    remove versões antigas de vpcr_changes (cada um uma vez por dia), faz checkpoint do WAL
+    e executa VACUUM se houver muito espaço livre.
+    Configuração em %APPDATA%/VPCR App/settings/maintenance_config.json.
+    """
+
+    CHECK_INTERVAL = 30        # segundos entre verificações de ociosidade
+    VACUUM_FREE_RATIO = 0.2    # VACUUM apenas com 20% ou mais de páginas livres
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self.archive_after_days = 365  # 0 desativa o arquivamento
+        self.idle_seconds = 300
+        self.last_archive_date = None
+        self.last_prune_date = None
+        self.load_settings()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._handled_activity = None
+
+    def _config_path(self):
+        appdata = os.getenv('APPDATA') or os.path.expanduser('~')
+        return os.path.join(appdata, 'VPCR App', 'settings', 'maintenance_config.json')
+
+    def save_settings(self):
+        """Salva a configuração de manutenção em arquivo"""
+        try:
+            config_path = self._config_path()
+            os.makedirs(os.path.dirname(config_path), exist_ok=True)
+            with open(config_path, "w", encoding='utf-8') as f:
+                json.dump({
+                    "archive_after_days": self.archive_after_days,
+                    "idle_seconds": self.idle_seconds,
+                    "last_archive_date": self.last_archive_date,
+                    "last_prune_date": self.last_prune_date
+                }, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            print(f"Erro ao salvar configuração de manutenção: {e}")
+
+    def load_settings(self):
+        """Carrega a configuração de manutenção salva"""
+        try:
+            config_path = self._config_path()
+            if os.path.exists(config_path):
+                with open(config_path, "r", encoding='utf-8') as f:
+                    config = json.load(f)
+                    self.archive_after_days = int(config.get("archive_after_days", self.archive_after_days))
+                    self.idle_seconds = int(config.get("idle_seconds", self.idle_seconds))
+                    self.last_archive_date = config.get("last_archive_date")
+                    self.last_prune_date = config.get("last_prune_date")
+        except Exception as e:
+            print(f"Erro ao carregar configuração de manutenção: {e}")
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        pool = self.db_manager.pool
+        while not self._stop_event.wait(self.CHECK_INTERVAL):
+            # Uma execução por período ocioso; conexões em uso (ex.: importação) adiam a manutenção
+            if pool.in_use or pool.last_activity == self._handled_activity:
+                continue
+            if time.monotonic() - pool.last_activity < self.idle_seconds:
+                continue
+            try:
+                self.run_maintenance()
+            except Exception as e:
+                print(f"Erro na manutenção do banco: {e}")
+            self._handled_activity = pool.last_activity
+
+    def run_maintenance(self):
+        """Arquiva o log antigo, faz checkpoint do WAL e compacta o banco se necessário"""
+        today = datetime.now().strftime('%Y-%m-%d')
+        if self.archive_after_days and self.last_archive_date != today:
+            moved = self.db_manager.archive_logs(self.archive_after_days)
+            if moved:
+                print(f"Manutenção: {moved} registros de log arquivados em {self.db_manager.archive_path}")
+            self.last_archive_date = today
+            self.save_settings()
+        
+        # Versões de sincronização antigas não são mais necessárias (uma vez por dia, mesmo sem arquivamento)
+        if self.last_prune_date != today:
+            self.db_manager.prune_item_changes()
+            self.last_prune_date = today
+            self.save_settings()
+        
+        if self._stop_event.is_set():
+            return
+        self.db_manager.checkpoint_wal()
+        
+        if not self._stop_event.is_set() and self.db_manager.free_page_ratio() >= self.VACUUM_FREE_RATIO:
+            print("Manutenção: executando VACUUM")
+            self.db_manager.vacuum()
+            self.db_manager.checkpoint_wal()
+
+
+class ImportPipeline:
+    """Importação de vários arquivos: leitura em paralelo e gravação por uma única thread.
+
+    Cada planilha é lida e normalizada em um processo do pool. A thread de gravação
+    aplica os resultados no SQLite na ordem de seleção, para que o diff de cada arquivo
+    enxergue o que os arquivos anteriores já gravaram.
+    """
+
+    def __init__(self, db_manager, jobs, on_progress=None, max_workers=None, cancel_token=None, on_finished=None):
+        self.db_manager = db_manager
+        self.jobs = jobs  # [(path, ParsedWorkbook ou None)]
+        self.on_progress = on_progress  # on_progress(message, current, total, details)
+        self.max_workers = max_workers or min(len(jobs), os.cpu_count() or 1)
+        self.cancel_token = cancel_token or CancellationToken()
+        self.on_finished = on_finished  # on_finished(pipeline), chamado na thread de gravação
+        self.results = []  # [{path, file_name, lines, result}] na ordem dos arquivos
+        self.writer_thread = None
+
+    @property
+    def is_running(self):
+        return bool(self.writer_thread and self.writer_thread.is_alive())
+
+    @property
+    def cancelled(self):
+        return self.cancel_token.cancelled
+
+    def cancel(self):
+        """Solicita o cancelamento; o arquivo em gravação é desfeito e os seguintes são ignorados"""
+        self.cancel_token.cancel()
+
+    def start(self):
+        """Inicia a thread de gravação (que também coordena o pool de leitura)"""
+        self.writer_thread = threading.Thread(target=self._run, daemon=True)
+        self.writer_thread.start()
+        return self
+
+    def join(self, timeout=None):
+        if self.writer_thread:
+            self.writer_thread.join(timeout)
+
+    def _emit(self, message, current, details=""):
+        if self.on_progress:
+            try:
+                self.on_progress(message, current, len(self.jobs), details)
+            except Exception as e:
+                print(f"Erro ao atualizar progresso da importação: {e}")
+
+    def _submit_all(self):
+        """Envia todas as planilhas para leitura em paralelo; retorna (executor, futures)"""
+        # Um único arquivo não compensa o custo de iniciar processos
+        if len(self.jobs) < 2 or self.max_workers < 2:
+            return None, []
+        try:
+            executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            # Planilhas grandes não passam pelo pool: são importadas em blocos pela thread de gravação
+            futures = [
+                None if workbook is not None and workbook.use_streaming
+                else executor.submit(prepare_import_worker, path, workbook.probe() if workbook is not None else None)
+                for path, workbook in self.jobs
+            ]
+            return executor, futures
+        except Exception as e:
+            print(f"Pool de processos indisponível, lendo arquivos sequencialmente: {e}")
+            return None, []
+
+    def _prepare(self, file_index, futures):
+        """Obtém a planilha normalizada (do pool ou, se indisponível, lendo nesta thread)"""
+        path, workbook = self.jobs[file_index]
+        if workbook is not None and workbook.use_streaming:
+            return None  # Importação em blocos (import_from_excel lê a planilha)
+        if futures and futures[file_index] is not None:
+            try:
+                return futures[file_index].result()
+            except BrokenProcessPool as e:
+                print(f"Pool de processos interrompido, lendo {os.path.basename(path)} sequencialmente: {e}")
+        if workbook is None:
+            workbook = ParsedWorkbook(path)
+        return DatabaseManager.prepare_import_frame(workbook)
+
+    def _run(self):
+        executor, futures = self._submit_all()
+        try:
+            for file_index, (path, workbook) in enumerate(self.jobs):
+                file_name = os.path.basename(path)
+                entry = {'path': path, 'file_name': file_name, 'lines': 0, 'result': None}
+                self.results.append(entry)
+                
+                if self.cancel_token.cancelled:
+                    entry['result'] = {'success': False, 'cancelled': True, 'error': 'Importação cancelada pelo usuário'}
+                    continue
+                
+                self._emit(f"Lendo {file_name}", file_index)
+                try:
+                    prepared = self._prepare(file_index, futures)
+                except Exception as e:
+                    entry['result'] = {'success': False, 'error': f"Erro ao ler arquivo: {e}"}
+                    self._emit(f"❌ Exceção: {file_name}", file_index + 1, f"Erro: {e}")
+                    continue
+                
+                lines = prepared.total_rows if prepared is not None else workbook.estimated_rows
+                entry['lines'] = lines
+                self._emit(f"Processando {file_name}", file_index, f"{lines} linhas encontradas")
+                
+                def progress_callback(message, file_index=file_index, file_name=file_name):
+                    # Mostrar apenas o avanço das linhas, não os logs detalhados
+                    if message.startswith("Processadas"):
+                        self._emit(f"Processando {file_name}", file_index, message)
+                
+                result = self.db_manager.import_from_excel(path, progress_callback, workbook=workbook, prepared=prepared,
+                                                           cancel_token=self.cancel_token)
+                entry['result'] = result
+                if result.get('total_rows') is not None:
+                    entry['lines'] = result['total_rows']
+                
+                if result.get('cancelled'):
+                    self._emit(f"⏹ Cancelado: {file_name}", file_index, "Alterações deste arquivo foram desfeitas")
+                elif result['success']:
+                    # Registrar o conteúdo importado (apenas se todas as linhas foram gravadas)
+                    if not result.get('failed_items'):
+                        try:
+                            if workbook is not None:
+                                digest, size = workbook.digest, workbook.size
+                            else:
+                                digest, size = ParsedWorkbook.digest_file(path)
+                            self.db_manager.record_imported_file(digest, size, file_name, entry['lines'], result)
+                        except Exception as e:
+                            print(f"Erro ao registrar arquivo importado {file_name}: {e}")
+                    
+                    logs_info = f", {result.get('logs_created', 0)} logs" if result.get('logs_created', 0) > 0 else ""
+                    success_msg = f"✅ {file_name}: {result['imported']} novos, {result['updated']} atualizados{logs_info}"
+                    self._emit(f"✅ Concluído: {file_name}", file_index + 1, success_msg)
+                else:
+                    error_msg = f"❌ {file_name}: {result.get('error', 'Erro desconhecido')}"
+                    self._emit(f"❌ Erro: {file_name}", file_index + 1, error_msg)
+        except Exception as e:
+            print(f"Erro na thread de gravação da importação: {e}")
+        finally:
+            if executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+            if self.on_finished:
+                try:
+                    self.on_finished(self)
+                except Exception as e:
+                    print(f"Erro ao finalizar importação: {e}")
+
+
 class ThemeManager:
     """Gerenciador de temas da aplicação"""
     
@@ -2038,6 +4301,8 @@ class VPCRApp:
     def __init__(self):
         self.theme_manager = ThemeManager()
         self.db_manager = DatabaseManager()
+        # Arquivamento do log, checkpoint e VACUUM enquanto o aplicativo está ocioso
+        self.maintenance_manager = MaintenanceManager(self.db_manager)
         self.icon_animator = NotificationIconAnimator()
         # Gerenciador de layout responsivo
         self.layout_manager = DetailLayoutManager(self)
@@ -2048,6 +4313,8 @@ class VPCRApp:
         self._update_timer = None
         # Dicionário para rastrear ícones animados
         self.animated_icons = {}
+        # Itens carregados do banco, invalidados pela versão de vpcr_changes
+        self.items_cache = VersionedCache()
         # Cabeçalho do 'banco de dados' — deve corresponder ao Controle VPCR.xlsb
         self.db_headers = [
             "ID",
@@ -2063,6 +4330,9 @@ class VPCRApp:
 
         # Carregar dados do banco de dados ao inicializar
         self.sample_data = self.load_data_from_db()
+        # Índices invertidos dos filtros, atualizados junto com sample_data
+        self.filter_index = FilterIndex(self.sample_data)
+        self.facet_service = FacetService(self.filter_index)
         # Inicializar sem mostrar cards - só aparecem após filtrar
         self.filtered_data = []
         self.has_any_filter_applied = False
@@ -2429,12 +4699,9 @@ class VPCRApp:
         self.pending_animated_buttons.clear()
         
         try:
-            for item in self.sample_data:
-                item_id = item.get("ID")
-                if self.db_manager.has_incomplete_todos(item_id):
-                    # Marcar para animação quando os cards forem criados
-                    # A animação real será iniciada no create_card
-                    pass
+            # Uma única consulta agregada carrega o resumo de TODOs de todos os itens;
+            # a animação real será iniciada no create_card
+            self.db_manager.get_todo_summary(refresh=True)
         except Exception as e:
             print(f"Erro ao inicializar animações de ícones: {e}")
     
@@ -2442,7 +4709,8 @@ class VPCRApp:
         """Atualiza as animações dos ícones após mudanças nos TODOs"""
         try:
             # Atualizar apenas os itens que não devem mais ser animados
-            active_ids = {item.get("ID") for item in self.sample_data if item and self.db_manager.has_incomplete_todos(item.get("ID"))}
+            incomplete_ids = self.db_manager.get_incomplete_todo_ids()
+            active_ids = {item.get("ID") for item in self.sample_data if item and str(item.get("ID")) in incomplete_ids}
             for item_id in list(self.animated_icons.keys()):
                 if item_id not in active_ids:
                     try:
@@ -2561,21 +4829,15 @@ class VPCRApp:
             pass
     
     def load_data_from_db(self):
-        """Carrega dados otimizado com cache"""
-        # Usar cache se disponível
-        if hasattr(self, '_cached_data') and self._cached_data:
-            return self._cached_data
-            
+        """Carrega os itens do banco, reaproveitando o cache enquanto a tabela vpcr não mudar"""
         try:
-            db_items = self.db_manager.get_all_items()
+            # Versão lida antes dos itens: alterações concorrentes serão reaplicadas no próximo refresh
+            version = self.db_manager.get_item_change_version()
+            db_items = self.items_cache.get(version, self.db_manager.get_all_items)
+            self._sync_version = version
             
             if db_items:
-                # Cache dos dados por 30 segundos
-                self._cached_data = db_items
-                import threading
-                threading.Timer(30, lambda: setattr(self, '_cached_data', None)).start()
-                
-                print(f"Dados carregados: {len(db_items)} itens")
+                print(f"Dados carregados: {len(db_items)} itens (cache: {self.items_cache.stats()})")
                 return db_items
             else:
                 print("Banco vazio")
@@ -2585,49 +4847,79 @@ class VPCRApp:
             print(f"Erro ao carregar dados: {e}")
             return []
 
-    def refresh_data_from_db(self):
-        """Recarrega os dados do banco de dados para a aplicação"""
-        try:
-            # Buscar itens do banco de dados
-            db_items = self.db_manager.get_all_items()
-            
-            if db_items:
-                # Atualizar sample_data com dados do banco
-                self.sample_data = db_items
-                # Atualizar dados filtrados
-                self.filter_data()
-                # Atualizar lista de cards
-                self.update_card_list()
-                # Atualizar opções de filtros
-                self.populate_filter_options()
-                print(f"Dados recarregados: {len(db_items)} itens do banco de dados")
-            else:
-                print("Nenhum item encontrado no banco de dados")
-                
-        except Exception as e:
-            print(f"Erro ao recarregar dados do banco: {e}")
+    # Campos usados pelos filtros: mudanças neles exigem recalcular as opções de filtro
+    FILTER_OPTION_FIELDS = ("vpcr", "Sourcing Manager", "Status", "Supplier", "Requestor", "Continuity")
+    # Filtros por campos de lista, respondidos pelas tabelas vpcr_items/vpcr_plants do banco
+    LIST_FILTER_FIELDS = {"PN": "items_affected", "Plant": "plants_affected"}
+    # Espera após a última mudança de filtro antes de refiltrar (cliques em sequência viram uma filtragem)
+    FILTER_DEBOUNCE_SECONDS = 0.15
     
     def refresh_data_from_db(self):
-        """Recarrega os dados do banco de dados após importação"""
+        """Atualiza sample_data com os itens alterados no banco desde a última sincronização
+        (importação ou salvamento), sem recarregar a tabela inteira."""
         try:
-            # Buscar todos os itens do banco de dados
-            db_items = self.db_manager.get_all_items()
+            changes = None
+            if getattr(self, '_sync_version', None) is not None:
+                changes = self.db_manager.get_item_changes_since(self._sync_version)
+            
+            if changes is None:
+                # Sem versão de referência (ou histórico já removido): recarregar tudo
+                self.items_cache.invalidate()
+                self.sample_data = self.load_data_from_db()
+                self.filter_index.build(self.sample_data)
+                options_changed = True
+                print(f"Dados recarregados: {len(self.sample_data)} itens do banco de dados")
+            else:
+                self._sync_version, changed_records, deleted_ids = changes
+                if not changed_records and not deleted_ids:
+                    print("Nenhuma alteração no banco desde a última sincronização")
+                    return
+                options_changed = self._apply_item_changes(changed_records, deleted_ids)
+                # sample_data já corresponde à nova versão: o cache continua válido
+                self.items_cache.set(self._sync_version, self.sample_data)
+                print(f"Dados atualizados: {len(changed_records)} itens alterados, {len(deleted_ids)} removidos")
             
-            if db_items:
-                # Atualizar sample_data com dados do banco
-                self.sample_data = db_items
-                # Atualizar dados filtrados
-                self.filter_data()
-                # Atualizar lista de cards
-                self.update_card_list()
-                # Atualizar opções de filtros
+            # filter_data recria os cards visíveis a partir dos itens atualizados
+            self.filter_data()
+            if options_changed:
                 self.populate_filter_options()
-                print(f"Dados atualizados: {len(db_items)} itens do banco de dados")
-            else:
-                print("Nenhum item encontrado no banco de dados")
                 
         except Exception as e:
             print(f"Erro ao atualizar dados do banco: {e}")
+    
+    def _apply_item_changes(self, changed_records, deleted_ids):
+        """Aplica em sample_data os itens alterados/removidos; retorna se as opções de filtro mudaram"""
+        positions = {item.get("ID"): index for index, item in enumerate(self.sample_data) if item}
+        options_changed = bool(deleted_ids)
+        
+        for record in changed_records:
+            index = positions.get(record.vpcr)
+            if index is None:
+                self.sample_data.append(record)
+                self.filter_index.add(record)
+                options_changed = True
+                continue
+            current = self.sample_data[index]
+            if any(current.get(field) != record.get(field) for field in self.FILTER_OPTION_FIELDS):
+                options_changed = True
+            # Atualizar no lugar: selected_item e filtered_data continuam apontando para o mesmo objeto
+            if isinstance(current, ItemRecord):
+                current.update_from(record)
+                self.filter_index.update(current)
+            else:
+                self.filter_index.remove(current)
+                self.sample_data[index] = record
+                self.filter_index.add(record)
+        
+        if deleted_ids:
+            remaining = []
+            for item in self.sample_data:
+                if item and item.get("ID") in deleted_ids:
+                    self.filter_index.remove(item)
+                else:
+                    remaining.append(item)
+            self.sample_data = remaining
+        return options_changed
         
     def init_card_structures(self):
         """Inicializa ou reinicializa estruturas necessárias para o gerenciamento dos cards"""
@@ -2951,6 +5243,8 @@ class VPCRApp:
             "Supplier": filter_width,
             "Requestor": filter_width,
             "Continuity": filter_width,
+            "PN": filter_width,
+            "Plant": filter_width,
         }
         self.filter_order = [
             "VPCR",
@@ -2959,6 +5253,8 @@ class VPCRApp:
             "Supplier",
             "Requestor",
             "Continuity",
+            "PN",
+            "Plant",
         ]
         # Define uma altura padronizada para todos os filtros
         filter_height = 38  # Altura fixa para todos os filtros
@@ -3023,6 +5319,26 @@ class VPCRApp:
             height=filter_height
         )
         
+        self.filter_pn_chips = ft.Container(
+            content=ft.Text("PN: Carregando...", size=12, no_wrap=True, overflow=ft.TextOverflow.ELLIPSIS),
+            bgcolor=colors["field_bg"],
+            border=ft.border.all(1, colors["field_border"]),
+            border_radius=8,
+            padding=ft.padding.symmetric(horizontal=12, vertical=8),
+            width=filter_width,
+            height=filter_height
+        )
+        
+        self.filter_plant_chips = ft.Container(
+            content=ft.Text("Plant: Carregando...", size=12, no_wrap=True, overflow=ft.TextOverflow.ELLIPSIS),
+            bgcolor=colors["field_bg"],
+            border=ft.border.all(1, colors["field_border"]),
+            border_radius=8,
+            padding=ft.padding.symmetric(horizontal=12, vertical=8),
+            width=filter_width,
+            height=filter_height
+        )
+        
         # armazenamento das seleções
         self.filter_selections = {
             "VPCR": set(),
@@ -3030,8 +5346,26 @@ class VPCRApp:
             "Status": set(),
             "Supplier": set(),
             "Requestor": set(),
-            "Continuity": set()
+            "Continuity": set(),
+            "PN": set(),
+            "Plant": set()
         }
+        # Busca de texto livre (título, PNs, comentários e fornecedores)
+        self.search_text = ""
+        self.search_ids = None
+        self.filter_search_field = ft.TextField(
+            hint_text="Buscar por título, PN, comentário ou fornecedor...",
+            prefix_icon=ft.Icons.SEARCH,
+            text_size=12,
+            content_padding=ft.padding.symmetric(horizontal=12, vertical=8),
+            bgcolor=colors["field_bg"],
+            border_color=colors["field_border"],
+            border_radius=8,
+            width=filter_width * 2 + 8,
+            height=filter_height,
+            on_change=self.on_search_change,
+            on_submit=self.on_search_change
+        )
         # Popular opções únicas a partir dos dados
         self.populate_filter_options()
 
@@ -3048,46 +5382,72 @@ class VPCRApp:
         )
         self.dropdown_open_for = None  # nome do campo atualmente aberto
     
-    def filter_data(self, e=None):
-        """Filtra os dados baseado nos filtros ativos"""
-        # filtros de multiseleção (conjuntos de valores)
-        vpcr_sel = self.filter_selections.get("VPCR", set())
-        sm_sel = self.filter_selections.get("Sourcing Manager", set())
-        status_multi_sel = self.filter_selections.get("Status", set())
-        supplier_sel = self.filter_selections.get("Supplier", set())
-        requestor_sel = self.filter_selections.get("Requestor", set())
-        continuity_sel = self.filter_selections.get("Continuity", set())
+    def schedule_filter_data(self, e=None, delay=None):
+        """Agenda filter_data com debounce: mudanças em sequência geram uma única filtragem.
+        
+        Cada pedido recebe uma geração nova; filtragens e reconstruções de cards de gerações
+        anteriores ainda em andamento são abandonadas. delay=0 filtra imediatamente.
+        """
+        self._filter_generation = getattr(self, '_filter_generation', 0) + 1
+        generation = self._filter_generation
+        # Mostrar a notificação se algum evento da sequência veio do usuário
+        if e is not None:
+            self._filter_event = e
+        timer = getattr(self, '_filter_timer', None)
+        if timer:
+            timer.cancel()
+        
+        def run():
+            if generation != self._filter_generation:
+                return
+            event, self._filter_event = getattr(self, '_filter_event', None), None
+            self.filter_data(event, generation=generation)
+        
+        if delay == 0:
+            self._filter_timer = None
+            run()
+            return
+        self._filter_timer = threading.Timer(self.FILTER_DEBOUNCE_SECONDS if delay is None else delay, run)
+        self._filter_timer.daemon = True
+        self._filter_timer.start()
+
+    def _filter_is_stale(self, generation):
+        """Indica que um estado de filtro mais novo já foi pedido"""
+        return generation is not None and generation != getattr(self, '_filter_generation', 0)
+
+    def filter_data(self, e=None, generation=None):
+        """Filtra os dados baseado nos filtros ativos.
+        
+        generation: geração do pedido (schedule_filter_data); chamadas diretas passam a ser a geração
+        mais nova e descartam filtragens agendadas ou em andamento.
+        """
+        if generation is None:
+            timer = getattr(self, '_filter_timer', None)
+            if timer:
+                timer.cancel()
+            self._filter_generation = getattr(self, '_filter_generation', 0) + 1
+            generation = self._filter_generation
+        
+        # filtros de multiseleção (conjuntos de valores); nada selecionado = mostrar todos
+        selections = {field: set(self.filter_selections.get(field, set())) for field in FilterIndex.FIELDS}
+        
+        # Busca de texto (FTS5): IDs ordenados por relevância, refeita a cada filtragem para refletir o banco
+        search_text = getattr(self, 'search_text', '').strip()
+        self.search_ids = self.db_manager.search_items(search_text) if search_text else None
         
         # Verificar se há algum filtro aplicado
-        self.has_any_filter_applied = (
-            bool(vpcr_sel) or bool(sm_sel) or bool(status_multi_sel) or 
-            bool(supplier_sel) or bool(requestor_sel) or bool(continuity_sel)
-        )
+        self.has_any_filter_applied = (any(selections.values()) or self.search_ids is not None
+                                       or any(self.filter_selections.get(field) for field in self.LIST_FILTER_FIELDS))
         
         # Se não há filtros aplicados E não estamos em modo de seleção, não mostrar nenhum card
         if not self.has_any_filter_applied and not getattr(self, 'card_select_mode', False):
             self.filtered_data = []
         else:
-            # Salvar IDs com animações antes de filtrar para preservá-las
-            animated_before_filter = set(self.animated_icons.keys())
-            
-            self.filtered_data = []
-            for item in self.sample_data:
-                def matches_multi(selected_set, value):
-                    if not selected_set:  # nada selecionado = mostrar todos
-                        return True
-                    return value in selected_set
-
-                vpcr_match = matches_multi(vpcr_sel, item.get("vpcr", ""))
-                sm_match = matches_multi(sm_sel, item.get("Sourcing Manager", ""))
-                status_multi_match = matches_multi(status_multi_sel, item.get("Status", ""))
-                supplier_match = matches_multi(supplier_sel, item.get("Supplier", ""))
-                requestor_match = matches_multi(requestor_sel, item.get("Requestor", ""))
-                continuity_match = matches_multi(continuity_sel, item.get("Continuity", ""))
-                
-                # Remover filtro de TODOs - todos os itens serão mostrados, mas ordenados por prioridade
-                if vpcr_match and sm_match and status_multi_match and supplier_match and requestor_match and continuity_match:
-                    self.filtered_data.append(item)
+            # Interseção dos índices invertidos, mantendo a ordem de sample_data (ou da relevância na busca)
+            filtered_data = self.filter_index.query(selections, self.search_ids, self._restrict_ids())
+            if self._filter_is_stale(generation):
+                return
+            self.filtered_data = filtered_data
         
         # Remover ordenação automática por TODOs - agora mantém ordem original
         
@@ -3108,7 +5468,7 @@ class VPCRApp:
                 print(f"Erro ao mostrar notificação: {ex}")
         
         try:
-            self.update_card_list(preserve_scroll=True)
+            self.update_card_list(preserve_scroll=True, generation=generation)
         except Exception as ex:
             print(f"Erro ao atualizar lista de cards: {ex}")
             # Tentar recriar a interface se houve erro crítico
@@ -3616,8 +5976,12 @@ class VPCRApp:
             if cache_key in self._todos_cache:
                 del self._todos_cache[cache_key]
     
-    def update_card_list(self, preserve_scroll=False):
-        """Atualiza a lista de cards de forma otimizada"""
+    def update_card_list(self, preserve_scroll=False, generation=None):
+        """Atualiza a lista de cards de forma otimizada.
+        
+        generation: geração do filtro que pediu a atualização; se um filtro mais novo chegar
+        durante a criação dos cards, a reconstrução é abandonada e a lista atual é mantida.
+        """
         if not hasattr(self, 'card_list'):
             return
             
@@ -3628,16 +5992,15 @@ class VPCRApp:
         self._updating_card_list = True
         
         try:
-            # Limpar controles existentes
-            self.card_list.controls.clear()
-            
             # Inicializar estruturas se necessário
             if not hasattr(self, 'recently_updated_items'):
                 self.recently_updated_items = set()
                 
-            # Criar cards de forma otimizada
+            # Criar cards de forma otimizada (antes de limpar, para poder abandonar a reconstrução)
             new_controls = []
             for item in self.filtered_data[:100]:  # Limitar para performance
+                if self._filter_is_stale(generation):
+                    return
                 try:
                     card = self.create_card(item)
                     new_controls.append(card)
@@ -3645,7 +6008,8 @@ class VPCRApp:
                     print(f"Erro ao criar card: {e}")
                     continue
             
-            # Adicionar em lote
+            # Substituir os controles em lote
+            self.card_list.controls.clear()
             self.card_list.controls.extend(new_controls)
             
             # Update único e específico
@@ -4893,6 +7257,8 @@ class VPCRApp:
         create_clickable_filter("Supplier", self.filter_supplier_chips)
         create_clickable_filter("Requestor", self.filter_requestor_chips)
         create_clickable_filter("Continuity", self.filter_continuity_chips)
+        create_clickable_filter("PN", self.filter_pn_chips)
+        create_clickable_filter("Plant", self.filter_plant_chips)
         
         # atualizar controles se já estiverem na página
         try:
@@ -4902,44 +7268,45 @@ class VPCRApp:
             self.filter_supplier_chips.update()
             self.filter_requestor_chips.update()
             self.filter_continuity_chips.update()
+            self.filter_pn_chips.update()
+            self.filter_plant_chips.update()
         except:
             pass
     
+    def _restrict_ids(self, exclude_field=None):
+        """IDs permitidos pela busca de texto e pelos filtros de PN/planta (None = sem restrição)"""
+        restrict = None
+        search_ids = getattr(self, 'search_ids', None)
+        if search_ids is not None:
+            restrict = set(search_ids)
+        for field, column in self.LIST_FILTER_FIELDS.items():
+            selected = self.filter_selections.get(field)
+            if not selected or field == exclude_field:
+                continue
+            # Busca pela chave (valor, vpcr) das tabelas normalizadas
+            ids = self.db_manager.get_items_with_list_values(column, selected)
+            restrict = ids if restrict is None else restrict & ids
+        return restrict
+
     def get_available_filter_options(self, exclude_field=None):
-        """Calcula opções de filtro disponíveis baseadas nos filtros já aplicados"""
-        # Aplicar todos os filtros EXCETO o campo especificado
-        filtered_data = []
-        for item in self.sample_data:
-            include_item = True
-            
-            # Aplicar cada filtro se não for o campo excluído
-            for field_name in ["VPCR", "Sourcing Manager", "Status", "Supplier", "Requestor", "Continuity"]:
-                if field_name == exclude_field:
-                    continue
-                    
-                selected_values = self.filter_selections.get(field_name, set())
-                if selected_values:  # Se há valores selecionados, verificar se o item corresponde
-                    item_value = item.get(field_name if field_name != "VPCR" else "vpcr", "")
-                    if item_value not in selected_values:
-                        include_item = False
-                        break
-            
-            # Remover filtro de TODOs - todos os itens serão mostrados
-            
-            if include_item:
-                filtered_data.append(item)
+        """Calcula opções de filtro disponíveis (valor, contagem) baseadas nos filtros já aplicados.
         
-        # Calcular valores únicos disponíveis nos dados filtrados
-        available_options = {
-            "VPCR": sorted({item.get("vpcr", "") for item in filtered_data if item.get("vpcr", "")}),
-            "Sourcing Manager": sorted({item.get("Sourcing Manager", "") for item in filtered_data if item.get("Sourcing Manager", "")}),
-            "Status": sorted({item.get("Status", "") for item in filtered_data if item.get("Status", "")}),
-            "Supplier": sorted({item.get("Supplier", "") for item in filtered_data if item.get("Supplier", "")}),
-            "Requestor": sorted({item.get("Requestor", "") for item in filtered_data if item.get("Requestor", "")}),
-            "Continuity": sorted({item.get("Continuity", "") for item in filtered_data if item.get("Continuity", "")})
-        }
-        
-        return available_options
+        Com exclude_field, calcula apenas esse campo, ignorando a seleção dele próprio.
+        """
+        if exclude_field in self.LIST_FILTER_FIELDS:
+            # PN/planta: contagem no banco, restrita aos itens que atendem aos demais filtros
+            restrict = self._restrict_ids(exclude_field)
+            within = None if restrict is None else self.filter_index.rows_for("VPCR", restrict)
+            rows = self.filter_index.match_rows(self.filter_selections, within=within)
+            item_ids = None if rows is None else {self.filter_index.rows[row].get("vpcr") for row in rows}
+            column = self.LIST_FILTER_FIELDS[exclude_field]
+            return {exclude_field: self.db_manager.get_list_value_counts(column, item_ids)}
+        fields = [exclude_field] if exclude_field else None
+        options = self.facet_service.facets(self.filter_selections, fields, self._restrict_ids())
+        if exclude_field is None:
+            for field in self.LIST_FILTER_FIELDS:
+                options.update(self.get_available_filter_options(field))
+        return options
 
     def show_dropdown_panel(self, field_name: str):
         """Mostra um painel dropdown customizado abaixo do filtro clicado (com busca e checkboxes)."""
@@ -4948,13 +7315,26 @@ class VPCRApp:
         available_options = self.get_available_filter_options(exclude_field=field_name)
         values = available_options.get(field_name, [])
 
-        # Criar checkboxes com estado atual
+        # Seleção ao abrir o painel, restaurada em "Cancelar"
+        original_selection = set(self.filter_selections[field_name])
+
+        def apply_selection():
+            # Cada mudança refiltra com debounce: cliques em sequência geram uma única filtragem
+            self.filter_selections[field_name] = {cb.data for cb in checkboxes if cb.value}
+            # Chips acompanham a seleção já aplicada aos cards; o contador é recalculado em filter_data
+            self.update_filter_display(field_name)
+            self._update_filters_title()
+            self.schedule_filter_data()
+
+        # Criar checkboxes com estado atual; o valor real fica em data e o rótulo mostra a contagem
         checkboxes = []
-        for value in values:
+        for value, count in values:
             checkboxes.append(
                 ft.Checkbox(
-                    label=value,
+                    label=f"{value} ({count})",
+                    data=value,
                     value=(value in self.filter_selections[field_name]),
+                    on_change=lambda e: apply_selection(),
                     label_style=ft.TextStyle(size=14, color=colors["text_primary"])
                 )
             )
@@ -4963,7 +7343,7 @@ class VPCRApp:
         def apply_search_filter(term: str):
             term = (term or "").strip().lower()
             for cb in checkboxes:
-                cb.visible = (term in cb.label.lower()) if term else True
+                cb.visible = (term in str(cb.data).lower()) if term else True
                 cb.update()
 
         def select_all(e):
@@ -4971,27 +7351,35 @@ class VPCRApp:
                 if cb.visible:
                     cb.value = True
                     cb.update()
+            apply_selection()
 
         def deselect_all(e):
             for cb in checkboxes:
                 if cb.visible:
                     cb.value = False
                     cb.update()
+            apply_selection()
 
         def clear_all(e):
-            self.filter_selections[field_name].clear()
             for cb in checkboxes:
                 cb.value = False
                 cb.update()
+            apply_selection()
 
         def apply_and_close(e):
-            self.filter_selections[field_name] = {cb.label for cb in checkboxes if cb.value}
+            self.filter_selections[field_name] = {cb.data for cb in checkboxes if cb.value}
             self.update_filter_display(field_name)
             self._update_filters_title()
-            self.filter_data()
+            # Aplicar já, substituindo a filtragem agendada
+            self.schedule_filter_data(e, delay=0)
             self.hide_dropdown_panel()
 
         def cancel_and_close(e):
+            if self.filter_selections[field_name] != original_selection:
+                self.filter_selections[field_name] = original_selection
+                self.update_filter_display(field_name)
+                self._update_filters_title()
+                self.schedule_filter_data(delay=0)
             self.hide_dropdown_panel()
 
         # Construir painel com largura máxima de 400px
@@ -5071,12 +7459,26 @@ class VPCRApp:
             self.filters_title_text.value = title
             self.page.update()
 
+    def on_search_change(self, e):
+        """Atualiza a busca de texto e refiltra os cards"""
+        self.search_text = e.control.value or ""
+        self.schedule_filter_data()
+
     def clear_all_filters(self, e=None):
         # limpar todas as seleções de todos os filtros
         for key in self.filter_selections.keys():
             self.filter_selections[key].clear()
             self.update_filter_display(key)
         
+        # limpar a busca de texto
+        self.search_text = ""
+        if hasattr(self, 'filter_search_field'):
+            self.filter_search_field.value = ""
+            try:
+                self.filter_search_field.update()
+            except Exception:
+                pass
+        
         # Atualizar contador no título
         self._update_filters_title()
         
@@ -5099,7 +7501,9 @@ class VPCRApp:
             "Status": self.filter_status_chips,
             "Supplier": self.filter_supplier_chips,
             "Requestor": self.filter_requestor_chips,
-            "Continuity": self.filter_continuity_chips
+            "Continuity": self.filter_continuity_chips,
+            "PN": self.filter_pn_chips,
+            "Plant": self.filter_plant_chips
         }
         container = container_map.get(field_name)
         
@@ -5212,10 +7616,7 @@ class VPCRApp:
             
             # Sempre definir new_data como 0 ao selecionar o card (independentemente do valor atual)
             try:
-                # Garantir que a coluna new_data existe antes de tentar atualizá-la
-                self.db_manager.ensure_column_exists('vpcr', 'new_data', 'BOOLEAN DEFAULT 0')
-                
-                with self.db_manager.get_connection() as conn:
+                with self.db_manager.get_connection('select_item') as conn:
                     cursor = conn.cursor()
                     cursor.execute(
                         "UPDATE vpcr SET new_data = 0 WHERE vpcr = ?", 
@@ -5829,14 +8230,226 @@ class VPCRApp:
         
         return field_str
 
+    def _format_log_entry(self, log):
+        """Pré-formata um registro do log (data, ícone e ação) para exibição e cache"""
+        # Formatar data
+        log_date = log.get('change_date', 'Data não disponível')
+        if log_date and log_date != 'Data não disponível':
+            try:
+                # Se está no formato do banco: YYYY-MM-DD HH:MM:SS
+                if isinstance(log_date, str) and len(log_date) >= 19:
+                    dt = datetime.strptime(log_date[:19], '%Y-%m-%d %H:%M:%S')
+                    log_date = dt.strftime('%d/%m/%Y %H:%M')
+                # Se está no formato ISO com T
+                elif isinstance(log_date, str) and 'T' in log_date:
+                    dt = datetime.fromisoformat(log_date.replace('Z', '+00:00'))
+                    log_date = dt.strftime('%d/%m/%Y %H:%M')
+                else:
+                    log_date = str(log_date)
+            except Exception as e:
+                print(f"DEBUG: Erro ao formatar data do log: {e}")
+                log_date = str(log_date)
+        
+        # Determinar ícone e nome da ação baseado no tipo de mudança
+        change_type = log.get('change_type', 'update')
+        if change_type == 'import_create':
+            icon = ft.Icons.ADD_CIRCLE_OUTLINE
+            icon_color = ft.Colors.GREEN
+            action_name = "CREATE"
+        elif change_type == 'manual_create':
+            icon = ft.Icons.ADD
+            icon_color = ft.Colors.GREEN
+            action_name = "CREATE"
+        elif change_type == 'manual_update':
+            icon = ft.Icons.EDIT_OUTLINED
+            icon_color = ft.Colors.BLUE
+            action_name = "UPDATE"
+        elif change_type == 'manual_delete':
+            icon = ft.Icons.DELETE_OUTLINE
+            icon_color = ft.Colors.RED
+            action_name = "DELETE"
+        elif change_type == 'import_update':
+            icon = ft.Icons.SYNC
+            icon_color = ft.Colors.ORANGE
+            action_name = "IMPORT"
+        else:
+            icon = ft.Icons.CHANGE_HISTORY
+            icon_color = None  # Cor de destaque do tema, resolvida ao criar o card
+            action_name = "CHANGE"
+        
+        return {
+            'id': log.get('id'),
+            'change_date': log.get('change_date'),
+            'field_name': log.get('field_name', 'N/A'),
+            'old_value': str(log.get('old_value', 'N/A')),
+            'new_value': str(log.get('new_value', 'N/A')),
+            'display_date': str(log_date),
+            'icon': icon,
+            'icon_color': icon_color,
+            'action_name': action_name
+        }
+
+    def _build_log_card(self, entry, colors):
+        """Cria o card de um registro do log já formatado por _format_log_entry"""
+        icon = entry['icon']
+        icon_color = entry['icon_color'] or colors["accent"]
+        action_name = entry['action_name']
+        
+        # Criar card do log
+        log_card = ft.Container(
+            content=ft.Column([
+                ft.Row([
+                    ft.Icon(icon, size=16, color=icon_color),
+                    ft.Text(action_name, 
+                            size=self.theme_manager.font_size, 
+                            weight=ft.FontWeight.BOLD,
+                            color=icon_color),
+                    ft.Text(f"Campo: {entry['field_name']}", 
+                            size=self.theme_manager.font_size, 
+                            color=colors["text_container_primary"],
+                            expand=True)
+                ], spacing=8),
+                ft.Column([
+                    ft.Text("Old Value:", size=self.theme_manager.font_size, color=colors["text_container_secondary"]),
+                    ft.Text(entry['old_value'], 
+                           size=self.theme_manager.font_size, 
+                           color=colors["text_container_primary"],
+                           expand=True)
+                ], spacing=2),
+                ft.Column([
+                    ft.Text("New Value:", size=self.theme_manager.font_size, color=colors["text_container_secondary"]),
+                    ft.Text(entry['new_value'], 
+                           size=self.theme_manager.font_size, 
+                           color=colors["text_container_primary"],
+                           expand=True)
+                ], spacing=2),
+                ft.Row([
+                    ft.Text("Date:", size=self.theme_manager.font_size, color=colors["text_container_secondary"]),
+                    ft.Text(entry['display_date'], size=self.theme_manager.font_size, color=colors["text_container_primary"])
+                ], spacing=8)
+            ], spacing=4),
+            bgcolor=colors["field_bg"],
+            padding=8,
+            border_radius=6,
+            border=ft.border.all(1, colors["field_bg"]),
+            margin=ft.margin.only(bottom=4)
+        )
+        return log_card
+
+    LOG_PAGE_SIZE = 50
+    LOG_CACHE_ITEMS = 20  # Itens com log formatado mantidos em cache
+    
+    def _get_log_pages(self, item_id):
+        """Retorna o cache de log do item ({'entries', 'cursor', 'has_more'}), recarregando se houver registro novo"""
+        if not hasattr(self, '_log_cache'):
+            self._log_cache = {}
+        
+        cached = self._log_cache.pop(item_id, None)
+        if cached is not None:
+            # Consulta de um único registro pelo índice: o cache só vale se nada foi registrado depois
+            newest, _, _ = self.db_manager.get_change_log_page(item_id, limit=1)
+            newest_key = (newest[0]['change_date'], newest[0]['id']) if newest else None
+            if cached['newest'] != newest_key:
+                cached = None
+        if cached is None:
+            rows, cursor, has_more = self.db_manager.get_change_log_page(item_id, limit=self.LOG_PAGE_SIZE)
+            newest_key = (rows[0]['change_date'], rows[0]['id']) if rows else None
+            cached = {
+                'entries': [self._format_log_entry(row) for row in rows],
+                'cursor': cursor,
+                'has_more': has_more,
+                'newest': newest_key
+            }
+        
+        # Reinserir no fim: os itens mais antigos do dicionário são descartados primeiro
+        self._log_cache[item_id] = cached
+        while len(self._log_cache) > self.LOG_CACHE_ITEMS:
+            self._log_cache.pop(next(iter(self._log_cache)))
+        return cached
+    
+    def _render_next_log_page(self, update=True):
+        """Cria os cards da próxima página do log do item selecionado (buscando no banco se necessário)"""
+        item_id = getattr(self, '_log_item_id', None)
+        if item_id is None or item_id not in getattr(self, '_log_cache', {}):
+            return
+        cached = self._log_cache[item_id]
+        
+        if self._log_rendered >= len(cached['entries']) and cached['has_more']:
+            rows, cursor, has_more = self.db_manager.get_change_log_page(
+                item_id, limit=self.LOG_PAGE_SIZE, before=cached['cursor'])
+            cached['entries'].extend(self._format_log_entry(row) for row in rows)
+            cached['cursor'] = cursor
+            cached['has_more'] = has_more
+        
+        # Os novos cards entram no lugar do botão (antes do histórico arquivado, se já exibido);
+        # o botão volta depois deles se houver mais
+        insert_at = len(self.log_content.controls)
+        if self._load_more_button in self.log_content.controls:
+            insert_at = self.log_content.controls.index(self._load_more_button)
+            self.log_content.controls.remove(self._load_more_button)
+        
+        colors = self.theme_manager.get_theme_colors()
+        page_entries = cached['entries'][self._log_rendered:self._log_rendered + self.LOG_PAGE_SIZE]
+        for entry in page_entries:
+            self.log_content.controls.insert(insert_at, self._build_log_card(entry, colors))
+            insert_at += 1
+        self._log_rendered += len(page_entries)
+        
+        if self._log_rendered < len(cached['entries']) or cached['has_more']:
+            self._load_more_button = ft.TextButton(
+                "Carregar mais",
+                icon=ft.Icons.EXPAND_MORE,
+                on_click=lambda e: self._render_next_log_page()
+            )
+            self.log_content.controls.insert(insert_at, self._load_more_button)
+        else:
+            self._load_more_button = None
+        
+        if update:
+            try:
+                if hasattr(self.log_content, 'page') and self.log_content.page:
+                    self.log_content.update()
+            except Exception as e:
+                print(f"DEBUG: Erro ao atualizar container de logs: {e}")
+    
+    def _on_log_scroll(self, e):
+        """Carrega a próxima página do log ao chegar perto do fim da lista"""
+        try:
+            if (getattr(self, '_load_more_button', None) is not None
+                    and e.max_scroll_extent and e.pixels >= e.max_scroll_extent - 200):
+                self._render_next_log_page()
+        except Exception as ex:
+            print(f"DEBUG: Erro ao paginar logs: {ex}")
+
+    def load_archived_vpcr_logs(self, item_id, button=None):
+        """Acrescenta ao container de logs os registros arquivados do VPCR"""
+        try:
+            colors = self.theme_manager.get_theme_colors()
+            archived = self.db_manager.get_archived_change_log(item_id, limit=200)
+            if button in self.log_content.controls:
+                self.log_content.controls.remove(button)
+            self.log_content.controls.append(
+                ft.Text(f"Histórico arquivado ({len(archived)})", size=12, color=colors["text_container_secondary"])
+            )
+            for log in archived:
+                self.log_content.controls.append(self._build_log_card(self._format_log_entry(log), colors))
+            if hasattr(self.log_content, 'page') and self.log_content.page:
+                self.log_content.update()
+        except Exception as e:
+            print(f"DEBUG: Erro ao carregar log arquivado: {e}")
+
     def load_vpcr_logs(self, item_id):
         """Carrega os logs de um VPCR específico e atualiza o container de logs"""
         if not item_id:
             return
             
         try:
-            # Buscar logs do VPCR
-            logs = self.db_manager.get_change_log(item_id, limit=50)
+            # Primeira página do log (cache por item, validado pelo registro mais recente)
+            page = self._get_log_pages(item_id)
+            logs = page['entries']
+            self._log_item_id = item_id
+            self._log_rendered = 0
+            self._load_more_button = None
             
             # Limpar container de logs
             self.log_content.controls.clear()
@@ -5857,96 +8470,18 @@ class VPCRApp:
                 )
                 self.log_content.controls.append(no_logs_card)
             else:
-                # Criar cards para cada log
-                colors = self.theme_manager.get_theme_colors()
-                
-                for log in logs:
-                    # Formatar data
-                    log_date = log.get('change_date', 'Data não disponível')
-                    if log_date and log_date != 'Data não disponível':
-                        try:
-                            # Se está no formato do banco: YYYY-MM-DD HH:MM:SS
-                            if isinstance(log_date, str) and len(log_date) >= 19:
-                                dt = datetime.strptime(log_date[:19], '%Y-%m-%d %H:%M:%S')
-                                log_date = dt.strftime('%d/%m/%Y %H:%M')
-                            # Se está no formato ISO com T
-                            elif isinstance(log_date, str) and 'T' in log_date:
-                                dt = datetime.fromisoformat(log_date.replace('Z', '+00:00'))
-                                log_date = dt.strftime('%d/%m/%Y %H:%M')
-                            else:
-                                log_date = str(log_date)
-                        except Exception as e:
-                            print(f"DEBUG: Erro ao formatar data do log: {e}")
-                            log_date = str(log_date)
-                    
-                    # Determinar ícone e nome da ação baseado no tipo de mudança
-                    change_type = log.get('change_type', 'update')
-                    if change_type == 'import_create':
-                        icon = ft.Icons.ADD_CIRCLE_OUTLINE
-                        icon_color = ft.Colors.GREEN
-                        action_name = "CREATE"
-                    elif change_type == 'manual_create':
-                        icon = ft.Icons.ADD
-                        icon_color = ft.Colors.GREEN
-                        action_name = "CREATE"
-                    elif change_type == 'manual_update':
-                        icon = ft.Icons.EDIT_OUTLINED
-                        icon_color = ft.Colors.BLUE
-                        action_name = "UPDATE"
-                    elif change_type == 'manual_delete':
-                        icon = ft.Icons.DELETE_OUTLINE
-                        icon_color = ft.Colors.RED
-                        action_name = "DELETE"
-                    elif change_type == 'import_update':
-                        icon = ft.Icons.SYNC
-                        icon_color = ft.Colors.ORANGE
-                        action_name = "IMPORT"
-                    else:
-                        icon = ft.Icons.CHANGE_HISTORY
-                        icon_color = colors["accent"]
-                        action_name = "CHANGE"
-                    
-                    # Criar card do log
-                    log_card = ft.Container(
-                        content=ft.Column([
-                            ft.Row([
-                                ft.Icon(icon, size=16, color=icon_color),
-                                ft.Text(action_name, 
-                                        size=self.theme_manager.font_size, 
-                                        weight=ft.FontWeight.BOLD,
-                                        color=icon_color),
-                                ft.Text(f"Campo: {log.get('field_name', 'N/A')}", 
-                                        size=self.theme_manager.font_size, 
-                                        color=colors["text_container_primary"],
-                                        expand=True)
-                            ], spacing=8),
-                            ft.Column([
-                                ft.Text("Old Value:", size=self.theme_manager.font_size, color=colors["text_container_secondary"]),
-                                ft.Text(str(log.get('old_value', 'N/A')), 
-                                       size=self.theme_manager.font_size, 
-                                       color=colors["text_container_primary"],
-                                       expand=True)
-                            ], spacing=2),
-                            ft.Column([
-                                ft.Text("New Value:", size=self.theme_manager.font_size, color=colors["text_container_secondary"]),
-                                ft.Text(str(log.get('new_value', 'N/A')), 
-                                       size=self.theme_manager.font_size, 
-                                       color=colors["text_container_primary"],
-                                       expand=True)
-                            ], spacing=2),
-                            ft.Row([
-                                ft.Text("Date:", size=self.theme_manager.font_size, color=colors["text_container_secondary"]),
-                                ft.Text(str(log_date), size=self.theme_manager.font_size, color=colors["text_container_primary"])
-                            ], spacing=8)
-                        ], spacing=4),
-                        bgcolor=colors["field_bg"],
-                        padding=8,
-                        border_radius=6,
-                        border=ft.border.all(1, colors["field_bg"]),
-                        margin=ft.margin.only(bottom=4)
+                # Criar cards apenas para a primeira página; as demais via "Carregar mais"/scroll
+                self._render_next_log_page(update=False)
+            
+            # Log antigo movido para o banco de arquivo pela manutenção: carregado sob demanda
+            if self.db_manager.has_archived_logs(item_id):
+                self.log_content.controls.append(
+                    ft.TextButton(
+                        "Ver histórico arquivado",
+                        icon=ft.Icons.HISTORY,
+                        on_click=lambda e, item_id=item_id: self.load_archived_vpcr_logs(item_id, e.control)
                     )
-                    
-                    self.log_content.controls.append(log_card)
+                )
             
             # Atualizar display
             try:
@@ -5999,6 +8534,7 @@ class VPCRApp:
             # Encontrar item base em sample_data
             updated_data = {}
             changes_made = False
+            imported_field_changed = False
             
             for base in self.sample_data:
                 if base.get("ID") == item_id:
@@ -6027,11 +8563,7 @@ class VPCRApp:
                     }
                     
                     # Usar uma única conexão para todas as operações
-                    conn = self.db_manager.get_connection()
-                    
-                    # Garantir que todas as colunas necessárias existam na tabela vpcr
-                    for app_field, db_field in db_field_map.items():
-                        self.db_manager.ensure_column_exists('vpcr', db_field, 'TEXT')
+                    conn = self.db_manager.get_connection('save_card_changes')
                     
                     try:
                         for f in editable_fields:
@@ -6071,6 +8603,8 @@ class VPCRApp:
                                         conn=conn  # Usar mesma conexão para evitar duplicação
                                     )
                                     changes_made = True
+                                    if db_field in self.db_manager.IMPORTED_FIELDS:
+                                        imported_field_changed = True
                         
                         # Adicionar ID aos dados para atualização
                         updated_data['ID'] = str(item_id)
@@ -6088,20 +8622,30 @@ class VPCRApp:
                         
                         # Executar UPDATE apenas se há campos para atualizar
                         if update_fields:
+                            # Campos da planilha (ex.: Link, SCR) alterados manualmente: a próxima
+                            # importação precisa comparar o item por completo
+                            cursor = conn.cursor()
+                            if imported_field_changed:
+                                update_fields.append("import_fingerprint = NULL")
+                                self.db_manager.invalidate_imported_files(cursor)
                             update_values.append(str(item_id))  # WHERE vpcr = ?
                             update_sql = f"UPDATE vpcr SET {', '.join(update_fields)} WHERE vpcr = ?"
-                            cursor = conn.cursor()
                             cursor.execute(update_sql, update_values)
                             print(f"DEBUG: Executou UPDATE para {item_id} com {len(update_fields)} campos")
                         
+                        # Gravar o log em lote na mesma transação do UPDATE
+                        self.db_manager.change_log.flush(conn)
                         conn.commit()
                         
                     except Exception as e:
+                        self.db_manager.change_log.discard(conn)
                         conn.rollback()
                         raise e
                     finally:
                         conn.close()
                     
+                    # Continuity é editável e também é campo de filtro
+                    self.filter_index.update(base)
                     break
                     
             # Remover do conjunto de sujos
@@ -6127,6 +8671,8 @@ class VPCRApp:
                             if display_field in self.detail_fields:
                                 self.detail_fields[display_field] = "" if value is None else value
                         
+                        self.filter_index.update(self.selected_item)
+                        
                         # Forçar atualização do painel de detalhes
                         if hasattr(self, 'detail_view') and self.detail_view:
                             self.detail_view.update()
@@ -6238,6 +8784,7 @@ class VPCRApp:
         # Container dos filtros organizados em 2 colunas
         self.filters_container = ft.Container(
             content=ft.Column([
+                self.filter_search_field,
                 ft.Row([
                     self.filter_vpcr_chips,
                     self.filter_sourcing_manager_chips
@@ -6249,6 +8796,10 @@ class VPCRApp:
                 ft.Row([
                     self.filter_requestor_chips,
                     self.filter_continuity_chips
+                ], spacing=8),
+                ft.Row([
+                    self.filter_pn_chips,
+                    self.filter_plant_chips
                 ], spacing=8)
             ], spacing=8),
             visible=self.filters_expanded
@@ -6668,7 +9219,8 @@ class VPCRApp:
             padding=ft.padding.all(10)
         )
             # Container de logs com scroll
-        self.log_content = ft.Column([], spacing=8, scroll=ft.ScrollMode.AUTO, expand=True)
+        self.log_content = ft.Column([], spacing=8, scroll=ft.ScrollMode.AUTO, expand=True,
+                                     on_scroll=self._on_log_scroll)
         
         # Inicializar com mensagem padrão
         default_log_msg = ft.Container(
@@ -7629,7 +10181,14 @@ class VPCRApp:
 
 def main():
     app = VPCRApp()
-    ft.app(target=app.main)
+    app.maintenance_manager.start()
+    try:
+        ft.app(target=app.main)
+    finally:
+        app.maintenance_manager.stop()
+        app.db_manager.close()
 
 if __name__ == "__main__":
+    # Necessário para o pool de processos da importação no executável (pyinstaller)
+    multiprocessing.freeze_support()
     main()